@@ -0,0 +1,179 @@
+# batch_eval.py
+
+# evaluates many logged game states at once: each row is a hand and the cards already
+# out of the shoe, and comes back with the stay/hit odds and the recommendation
+#
+#   python batch_eval.py hands.csv -o audited.csv --workers 4
+#
+# rows give "hand" and optionally "dealt" as ranks separated by spaces, commas or
+# semicolons (e.g. "10 6" and "5,K,K"), and optionally "n_decks". any other columns are
+# passed through. states that leave the same cards by value and the same hand value are
+# the same game, so each is worked out once however many rows share it. with the exact and
+# optimal methods, doubling down and splitting (for a two-card pair) are valued as well, 
+# and best_action picks among all of them. pandas is only needed for evaluate_frame
+
+import argparse
+import csv
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from blackjack import *
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+result_columns = (
+    ["hand_value","soft","cards_left"]
+    + [f"{choice}_{outcome}" for choice in ("stay","hit") for outcome in outcome_keys]
+    + ["p_win_stay","p_win_hit","recommendation"]
+    + [f"ev_{action}" for action in ("stay","hit","double","split")]
+    + ["best_action","error"]
+    )
+
+
+# ranks from a logged field: a list, a separated string or a blank
+def parse_ranks(value):
+
+    if value is None or (isinstance(value,float) and value != value): # None or NaN
+        return []
+    if isinstance(value,str):
+        return [rank for rank in re.split(r"[\s,;|]+",value) if rank]
+    return [str(rank) for rank in value]
+
+
+def _evaluate_chunk(chunk,method,house_rule,actions=False):
+
+    return [
+        get_hit_stay_probs(HandState(hard_total,aces,pair_rank),CountDeck(counts,n_decks),
+                           method=method,cache=None,house_rule=house_rule,actions=actions)
+        for hard_total,aces,pair_rank,counts,n_decks in chunk
+        ]
+
+
+def result_row(hand,deck,hit_stay_d):
+
+    row = {
+        "hand_value":hand.get_hand_value(),
+        "soft":hand.is_soft(),
+        "cards_left":len(deck),
+        "p_win_stay":calc_p_win_sans_draws(hit_stay_d["stay"]),
+        "p_win_hit":calc_p_win_sans_draws(hit_stay_d["hit"]),
+        "recommendation":get_recommendation(hit_stay_d),
+        "best_action":get_best_action(hit_stay_d),
+        "error":""
+        }
+    for choice in ("stay","hit"):
+        for outcome in outcome_keys:
+            row[f"{choice}_{outcome}"] = hit_stay_d[choice][outcome]
+    for action in ("stay","hit","double","split"):
+        action_d = hit_stay_d.get(action)
+        row[f"ev_{action}"] = action_d.get("ev",calc_expected_value(action_d)) if action_d else None
+    return row
+
+
+# rows are dicts with "hand" and optionally "dealt" and "n_decks"; returns one result dict
+# per row, in order. rows that can't be read get their reason in "error" instead. actions
+# defaults to valuing doubling and splitting whenever the method can
+def evaluate_states(rows,method="exact",house_rule="two_cards",n_workers=1,chunk_size=256,
+                    verbose=False,actions=None):
+
+    start = time.perf_counter()
+    if actions is None:
+        actions = method in action_methods
+    states = list()
+    unique = dict() # canonical key -> position in the work list
+    work = list()
+    for row in rows:
+        try:
+            hand, deck = state_from_ranks(
+                parse_ranks(row.get("hand")),parse_ranks(row.get("dealt")),
+                int(row.get("n_decks") or 1)
+                )
+            if len(deck) < 3:
+                raise ValueError("not enough cards left to play")
+        except (TypeError,ValueError) as e:
+            states.append(str(e))
+            continue
+        key = RecommendationCache.make_key(hand,deck,method,house_rule,actions)
+        if key not in unique:
+            unique[key] = len(work)
+            work.append((hand.hard_total,hand.aces,hand.pair_rank,tuple(int(n) for n in deck.counts),
+                         deck.n_decks))
+        states.append((hand,deck,unique[key]))
+
+    chunks = [work[i:i+chunk_size] for i in range(0,len(work),chunk_size)]
+    if n_workers == 1 or len(chunks) <= 1:
+        evaluated = [_evaluate_chunk(chunk,method,house_rule,actions) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            evaluated = list(pool.map(
+                _evaluate_chunk,chunks,[method]*len(chunks),[house_rule]*len(chunks),
+                [actions]*len(chunks)
+                ))
+    hit_stay_ds = [hit_stay_d for chunk in evaluated for hit_stay_d in chunk]
+
+    results = list()
+    for state in states:
+        if isinstance(state,str):
+            results.append({**{k:None for k in result_columns},"error":state})
+        else:
+            hand, deck, i = state
+            results.append(result_row(hand,deck,hit_stay_ds[i]))
+
+    if verbose:
+        print(f"{len(results)} rows, {len(work)} distinct states, \
+{sum(isinstance(state,str) for state in states)} unreadable, {time.perf_counter()-start:.2f} s")
+    return results
+
+
+# the frame with the result columns added
+def evaluate_frame(df,method="exact",house_rule="two_cards",n_workers=1,chunk_size=256,
+                   verbose=False,actions=None):
+
+    if pd is None:
+        raise ImportError("evaluate_frame needs pandas; use evaluate_csv or evaluate_states without it")
+    results = evaluate_states(
+        df.to_dict("records"),method,house_rule,n_workers,chunk_size,verbose,actions
+        )
+    results = pd.DataFrame(results,columns=result_columns,index=df.index)
+    return pd.concat([df.drop(columns=[k for k in result_columns if k in df.columns]),results],axis=1)
+
+
+def evaluate_csv(in_path,out_path=None,method="exact",house_rule="two_cards",n_workers=1,
+                 chunk_size=256,verbose=False,actions=None):
+
+    with open(in_path,newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        fieldnames = [k for k in reader.fieldnames or [] if k not in result_columns]
+    results = evaluate_states(rows,method,house_rule,n_workers,chunk_size,verbose,actions)
+    rows = [{**{k:row[k] for k in fieldnames},**result} for row,result in zip(rows,results)]
+
+    if out_path is not None:
+        with open(out_path,"w",newline="") as f:
+            writer = csv.DictWriter(f,fieldnames=fieldnames+result_columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    return rows
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Evaluate logged blackjack states in bulk.")
+    parser.add_argument("in_path",help="CSV with a hand column and optional dealt and n_decks columns")
+    parser.add_argument("-o","--out-path",default=None,help="CSV to write (default: input name + _evaluated)")
+    parser.add_argument("--method",default="exact",help="get_hit_stay_probs method")
+    parser.add_argument("--house-rule",default="two_cards",choices=house_rules)
+    parser.add_argument("--workers",type=int,default=1,help="worker processes")
+    parser.add_argument("--chunk-size",type=int,default=256,help="states per worker task")
+    parser.add_argument("--no-actions",action="store_true",help="value only staying and hitting")
+    args = parser.parse_args()
+
+    out_path = args.out_path or re.sub(r"(\.csv)?$","_evaluated.csv",args.in_path,count=1)
+    evaluate_csv(args.in_path,out_path,args.method,args.house_rule,args.workers,args.chunk_size,
+                 verbose=True,actions=False if args.no_actions else None)
+    print(f"written to {out_path}")
@@ -0,0 +1,270 @@
+# benchmark.py
+
+# times the blackjack engine's entry points across a matrix of iteration counts,
+# hand types and deck depletion levels, and appends the results to a JSON lines
+# history so runs from different commits can be compared
+#
+#   python benchmark.py            full matrix, saved to benchmark_history.jsonl
+#   python benchmark.py --quick    smaller matrix for a fast check
+#   python benchmark.py --compare  also print the change against the last other commit
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from blackjack import *
+
+
+default_history_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),"benchmark_history.jsonl")
+
+hand_types = {
+    "hard":["10","6"],
+    "soft":["A","6"],
+    "aces":["A","A"]
+    }
+depletion_levels = [0.,0.25,0.5]
+
+
+# a hand of the given type and the deck it came from, with a share of the rest already dealt
+def make_state(hand_type,depletion,seed=0):
+
+    random.seed(seed)
+    deck = Deck().shuffle()
+    hand = Hand(deck=deck,drawn_hand=[c(rank,deck=deck) for rank in hand_types[hand_type]])
+    deck.draw_random_cards(int(depletion*len(deck.cards)))
+    return hand, deck
+
+
+# best wall time of `repeat` runs, then one more run under tracemalloc for peak memory
+def measure(fn,repeat=3):
+
+    seconds = min([timed(fn) for _ in range(repeat)])
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def timed(fn):
+
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def record(entry,params,seconds,peak,calls=1,deals=None,instrument=None):
+
+    result = {
+        "entry":entry,
+        "params":params,
+        "seconds":seconds,
+        "calls_per_sec":calls/seconds,
+        "peak_kib":peak/1024
+        }
+    if deals is not None:
+        result["deals"] = deals
+        result["deals_per_sec"] = deals/seconds
+    if instrument is not None:
+        result["timers"] = instrument.timers
+    print(f"{entry:<32} {json.dumps(params):<60} {seconds*1000:>10.2f} ms \
+{result.get('deals_per_sec',result['calls_per_sec']):>14,.0f} /s {result['peak_kib']:>10.1f} KiB")
+    return result
+
+
+def bench_card_get_value(n_calls=100000):
+
+    cards = Deck().cards
+    def fn():
+        for i in range(n_calls):
+            cards[i % len(cards)].get_value()
+    seconds, peak = measure(fn)
+    return [record("Card.get_value",{"calls":n_calls},seconds,peak,calls=n_calls)]
+
+
+def bench_hand_get_hand_value(n_calls=20000):
+
+    results = list()
+    for hand_type in hand_types:
+        hand, _ = make_state(hand_type,0.)
+        def fn():
+            for _ in range(n_calls):
+                hand.get_hand_value()
+        seconds, peak = measure(fn)
+        results.append(record(
+            "Hand.get_hand_value",{"hand":hand_type,"calls":n_calls},seconds,peak,calls=n_calls
+            ))
+    return results
+
+
+def bench_simulate_hand_draws(niters_list):
+
+    results = list()
+    for niters in niters_list:
+        for depletion in depletion_levels:
+            _, deck = make_state("hard",depletion)
+            fn = lambda: simulate_hand_draws(niters=niters,deck=deck,track=False)
+            seconds, peak = measure(fn)
+            results.append(record(
+                "simulate_hand_draws",{"niters":int(niters),"depletion":depletion},
+                seconds,peak,deals=int(niters)
+                ))
+    return results
+
+
+def bench_simulate_hand_draws_vectorized(niters_list):
+
+    results = list()
+    for niters in niters_list:
+        for depletion in depletion_levels:
+            _, deck = make_state("hard",depletion)
+            count_deck = deck.to_count_deck()
+            fn = lambda: simulate_hand_draws_vectorized(niters=niters,deck=count_deck,rng=0)
+            seconds, peak = measure(fn)
+            results.append(record(
+                "simulate_hand_draws_vectorized",{"niters":int(niters),"depletion":depletion},
+                seconds,peak,deals=int(niters)
+                ))
+    return results
+
+
+# games played per get_hit_stay_probs call with the default iteration counts
+method_deals = {"exact":None,"simulate":int(1e4+1e2*1e2),"vectorized":int(1e4+1e2*1e2),"crn":int(1e4)}
+
+
+def bench_get_hit_stay_probs(methods):
+
+    results = list()
+    for method in methods:
+        for hand_type in hand_types:
+            for depletion in depletion_levels:
+                hand, deck = make_state(hand_type,depletion)
+                fn = lambda: get_hit_stay_probs(hand,deck,method=method,cache=None)
+                # the progress prints of the simulate path would swamp the report
+                fn = silenced(fn)
+                seconds, peak = measure(fn,repeat=1 if method == "simulate" else 3)
+                # one more run for the time spent in each phase
+                instrument = Instrumentation()
+                get_hit_stay_probs(hand,deck,method=method,cache=None,instrument=instrument)
+                results.append(record(
+                    "get_hit_stay_probs",
+                    {"method":method,"hand":hand_type,"depletion":depletion},
+                    seconds,peak,deals=method_deals[method],instrument=instrument
+                    ))
+    return results
+
+
+def silenced(fn):
+
+    def wrapped():
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+    return wrapped
+
+
+def get_commit():
+
+    try:
+        return subprocess.run(
+            ["git","rev-parse","--short","HEAD"],capture_output=True,text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# random and specific draws from multi-deck shoes must leave the deck's position index 
+# in step with its cards, or the timings below are of a broken engine
+def check_deck_index(n_trials=50,seed=0):
+
+    random.seed(seed)
+    for n_decks in [1,2,6,8]:
+        for _ in range(n_trials):
+            deck = Deck(n_decks)
+            deck.draw_random_cards(random.randrange(len(deck.cards)))
+            deck.check_positions()
+            for card in random.sample(standard_cards,10):
+                deck.draw_specific_cards(card)
+                deck.check_positions()
+                if (card in deck) != (card in deck.cards):
+                    raise ValueError(f"{card.rank}{card.suit} membership disagrees with the deck")
+
+
+def run_benchmarks(quick=False):
+
+    check_deck_index(n_trials=10 if quick else 50)
+    if quick:
+        scalar_niters, vector_niters, methods = [1e2,1e3], [1e4,1e5], ["exact","vectorized","crn"]
+    else:
+        scalar_niters, vector_niters = [1e2,1e3,1e4], [1e4,1e5,1e6]
+        methods = ["exact","simulate","vectorized","crn"]
+
+    results = list()
+    results += bench_card_get_value()
+    results += bench_hand_get_hand_value()
+    results += bench_simulate_hand_draws(scalar_niters)
+    results += bench_simulate_hand_draws_vectorized(vector_niters)
+    results += bench_get_hit_stay_probs(methods)
+
+    return {
+        "commit":get_commit(),
+        "timestamp":datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "quick":quick,
+        "results":results
+        }
+
+
+def save_run(run,path=default_history_path):
+
+    with open(path,"a") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+def load_history(path=default_history_path):
+
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# speedup of each benchmark against the most recent run from a different commit
+def compare_runs(run,history):
+
+    previous = [old for old in history if old["commit"] != run["commit"]]
+    if not previous:
+        print("no earlier commit in the history to compare against")
+        return
+    previous = previous[-1]
+    old_seconds = {
+        (r["entry"],json.dumps(r["params"],sort_keys=True)):r["seconds"] for r in previous["results"]
+        }
+    print(f"\nspeedup vs {previous['commit']} ({previous['timestamp']}):")
+    for r in run["results"]:
+        key = (r["entry"],json.dumps(r["params"],sort_keys=True))
+        if key in old_seconds:
+            print(f"{r['entry']:<32} {key[1]:<60} {old_seconds[key]/r['seconds']:>8.2f}x")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the blackjack engine.")
+    parser.add_argument("--quick",action="store_true",help="run a smaller matrix")
+    parser.add_argument("--history",default=default_history_path,help="JSON lines history file")
+    parser.add_argument("--no-save",action="store_true",help="don't append this run to the history")
+    parser.add_argument("--compare",action="store_true",help="compare against the last other commit")
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    run = run_benchmarks(quick=args.quick)
+    if not args.no_save:
+        save_run(run,args.history)
+    if args.compare:
+        compare_runs(run,history)
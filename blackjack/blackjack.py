@@ -1,12 +1,19 @@
 # blackjack.py
 
 from math import comb
+import atexit
+import copy
+import json
+import os
+import pickle
 import random 
 import itertools
 import re 
 import numpy as np
-from copy import deepcopy
-from functools import reduce
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from time import perf_counter
 
 
 # estimate the prob of a specific number k using the hypergeometric distribution 
@@ -14,51 +21,94 @@ def p_hg(K,k,N,n):
     return comb(K,k) * comb(N-K,n-k) / comb(N,n)
 
 
+# hard value of each card value class, index 0 is the ace (counted as 1 until scored)
+value_classes = np.arange(1,11)
+
+card_ranks = [str(i+1) for i in range(1,10)] + ["J","Q","K","A"]
+card_suits = ["H","D","C","S"]
+rank_index = {rank:i for i,rank in enumerate(card_ranks)}
+# hard value of each rank slot in card_ranks order (ace counted as 1), and its value class
+rank_hard_values = np.array([2,3,4,5,6,7,8,9,10,10,10,10,1])
+rank_value_classes = rank_hard_values - 1
+
+
+# Cards are flyweights: there is one shared, immutable instance per (rank, suit), created 
+# the first time it is asked for, with its value and ace flag worked out once up front. 
+# Card("A","S") is Card("A","S"), and copying or pickling a card gives the same instance.
 class Card:
 
-    def determine_if_ace(self):
-        
-        if self.rank == "A":
-            self.is_ace = True
-        else:
-            self.is_ace = False
-        return self.is_ace
+    __slots__ = ("rank","suit","is_ace","value","hard_value")
+    _interned = dict()
 
+    def __new__(cls,rank,suit=None):
 
-    def __init__(self,rank,suit=None):
-        
-        self.rank = str(rank) # A,2-10,J,Q,K
-        self.suit = suit # S,C,H,D
-        self.determine_if_ace()
+        rank = str(rank) # A,2-10,J,Q,K
+        card = cls._interned.get((rank,suit))
+        if card is None:
+            card = object.__new__(cls)
+            value = cls.parse_value(rank)
+            object.__setattr__(card,"rank",rank)
+            object.__setattr__(card,"suit",suit) # S,C,H,D
+            object.__setattr__(card,"is_ace",rank == "A")
+            object.__setattr__(card,"value",value)
+            # numeric value with aces counted as 1, what hand scoring adds up
+            object.__setattr__(card,"hard_value",1 if rank == "A" else value)
+            cls._interned[(rank,suit)] = card
+        return card
 
 
-    def get_value(self): #will_bust=False
+    @staticmethod
+    def parse_value(rank):
         
         num = re.search(
             "([0-9]*)",
-            self.rank
+            rank
             )[0]
         
         if num:
-            self.value = int(num)
-        else:
-            face = re.search(
-                "([JQK]*)",
-                self.rank,
-                flags=re.IGNORECASE
-                )[0].upper()
-            
-            if face:
-                self.value = 10
-            else:
-                ace = re.search(
-                    "(A*)",
-                    self.rank,
-                    flags=re.IGNORECASE
-                    )[0].upper()
-                if ace:
-                    self.value = "Context-dependent, 1 or 11."
+            return int(num)
+        face = re.search(
+            "([JQK]*)",
+            rank,
+            flags=re.IGNORECASE
+            )[0].upper()
+        if face:
+            return 10
+        ace = re.search(
+            "(A*)",
+            rank,
+            flags=re.IGNORECASE
+            )[0].upper()
+        if ace:
+            return "Context-dependent, 1 or 11."
+        return None
+
+
+    def __setattr__(self,name,value):
+        raise AttributeError("cards are shared and immutable")
+
+
+    def __delattr__(self,name):
+        raise AttributeError("cards are shared and immutable")
+
+
+    def __copy__(self):
+        return self
+
+
+    def __deepcopy__(self,memo):
+        return self
+
+
+    def __reduce__(self):
+        return (Card,(self.rank,self.suit))
 
+
+    def determine_if_ace(self):
+        return self.is_ace
+
+
+    def get_value(self): #will_bust=False
         return self.value
 
 
@@ -71,50 +121,108 @@ class Card:
 
 
 
+# the 52 shared cards every Deck is built from
+standard_cards = tuple(Card(r,s) for r,s in itertools.product(card_ranks,card_suits))
+
+
 class Deck:
 
-    def __init__(self):
+    # n_decks > 1 makes a shoe of several standard decks shuffled together
+    def __init__(self,n_decks:int=1):
         
-        ranks = [str(i+1) for i in range(1,10)] + ["J","Q","K","A"]
-        suits = ["H","D","C","S"]
-        # creates a standard 52 card deck 
-        self.cards = [Card(r,s) for r,s in itertools.product(ranks,suits)]
+        # creates a standard 52 card deck (per n_decks)
+        self.n_decks = n_decks
+        self.cards = list(standard_cards)*n_decks
+        # remaining cards per rank, in card_ranks order, kept in step with self.cards so 
+        # the odds engines can start from the counts without looking at the cards
+        self.counts = np.full(len(card_ranks),len(card_suits)*n_decks,dtype=np.int64)
+        self.index_positions()
+
+
+    # where each card sits in self.cards; cards are interned, so the card is the key, and
+    # a shoe holds n_decks copies of each card, hence a set of positions
+    def index_positions(self):
+
+        self.positions = dict()
+        for i,card in enumerate(self.cards):
+            self.positions.setdefault(card,set()).add(i)
         
 
     def shuffle(self,returns="self"):
         
         random.shuffle(self.cards)
+        self.index_positions()
         if returns=="cards":
             return self.cards
         elif returns=="self":
             return self
 
 
+    # takes the card at position i out in O(1) by moving the last card into its place
+    # (the unordered half of a Fisher-Yates swap). in a shoe the moved card can be another
+    # copy of the one taken, so i leaves the taken card's positions before the moved card's 
+    # positions gain it
+    def pop_position(self,i):
+
+        last = self.cards.pop()
+        last_i = len(self.cards)
+        self.positions[last].discard(last_i)
+        if i < last_i:
+            card = self.cards[i]
+            self.cards[i] = last
+            self.positions[card].discard(i)
+            self.positions[last].add(i)
+        else:
+            card = last
+        if not self.positions[card]:
+            del self.positions[card]
+        self.counts[rank_index[card.rank]] -= 1
+        return card
+
+
+    # each card is picked uniformly from what's left, so no shuffle is needed first
     def draw_random_cards(self,number:int):
         
         drawn = list()
         for _ in range(number):
-            drawn.append(self.cards.pop(0))
+            drawn.append(self.pop_position(random.randrange(len(self.cards))))
         return drawn
     
 
+    # cards not in the deck are skipped
     def draw_specific_cards(self,cards_to_pull):
         
         if not isinstance(cards_to_pull,list):
             cards_to_pull = [cards_to_pull]
 
         drawn = list()
-        for deck_i,deck_card in enumerate(self.cards):
-            for card_to_pull in cards_to_pull:
-                rank_same = (deck_card.rank == card_to_pull.rank)
-                suit_same = (deck_card.suit == card_to_pull.suit)
-                if rank_same and suit_same:
-                    drawn.append(self.cards.pop(deck_i))
-                    continue 
+        for card_to_pull in cards_to_pull:
+            positions = self.positions.get(Card(card_to_pull.rank,card_to_pull.suit))
+            if positions:
+                drawn.append(self.pop_position(next(iter(positions))))
 
         return drawn
 
 
+    def __contains__(self,card):
+        return card in self.positions
+
+
+    # raises if the position index or the rank counts have drifted from self.cards
+    def check_positions(self):
+
+        positions = dict()
+        for i,card in enumerate(self.cards):
+            positions.setdefault(card,set()).add(i)
+        if positions != self.positions:
+            raise ValueError("deck position index is out of step with its cards")
+        counts = np.zeros(len(card_ranks),dtype=np.int64)
+        for card in self.cards:
+            counts[rank_index[card.rank]] += 1
+        if not np.array_equal(counts,self.counts):
+            raise ValueError("deck rank counts are out of step with its cards")
+
+
     # in process, remove 
     def remove(self,cards_to_pull,setting="cards"):
         
@@ -134,57 +242,244 @@ class Deck:
             return [card for card in self.cards if card.rank==rank]
 
 
+    # remaining cards per rank, in card_ranks order
+    def get_rank_counts(self):
+        return self.counts.copy()
+
+
+    # share of the shoe already dealt
+    def get_penetration(self):
+        return 1 - len(self.cards)/(len(standard_cards)*self.n_decks)
+
+
+    def to_count_deck(self):
+        return CountDeck(self.counts,n_decks=self.n_decks)
+
+
 class Hand:
 
     bust_threshold=22
 
     def __init__(self,deck,number_to_draw:int=2,drawn_hand:list=None,random:bool=False):
         
+        # running totals, kept in step by add_cards so scoring never rescans the hand
+        self.hand = list()
+        self.hard_total = 0
+        self.aces = 0
+
         if drawn_hand is not None:
-            self.hand = deck.draw_specific_cards(drawn_hand)
+            self.add_cards(deck.draw_specific_cards(drawn_hand))
         else:
             random = True
 
         if random:
-            self.hand = deck.draw_random_cards(number_to_draw)
+            self.add_cards(deck.draw_random_cards(number_to_draw))
 
 
-    def get_hand_value(self):
+    # every card joins the hand through here; append to self.hand directly and the 
+    # running totals go stale
+    def add_cards(self,cards):
 
-        sum_sans_ace = sum([card.get_value() for card in self.hand if not card.is_ace])
-        self.value = sum_sans_ace
-        ace_count = sum([card.is_ace for card in self.hand])
-        # ace iterate, starts with highest, then goes to lowest
-        bust = True
-        for combo in itertools.combinations_with_replacement([11,1],r=ace_count):
-            if (self.value + sum(combo)) >= self.bust_threshold:
-                continue
-            else: 
-                self.value += sum(combo)
-                bust = False
-                break 
-        if bust:
-            self.value += sum(combo)
+        for card in cards:
+            self.hand.append(card)
+            self.hard_total += card.hard_value
+            self.aces += card.is_ace
+
+
+    # at most one ace can count as 11 without busting, so the value follows from the 
+    # hard total (aces as 1) and whether there is an ace at all
+    def get_hand_value(self):
 
+        self.value = score_hard_total(self.hard_total,self.aces,self.bust_threshold)
         return self.value    
 
 
     def draw_random_cards(self,number,deck,returns="self"):
   
-        deck.shuffle()
         drawn = deck.draw_random_cards(number)
-        self.hand += drawn
+        self.add_cards(drawn)
 
         if returns == "self":
             return self
         elif returns == "cards":
-            return hand.hand
+            return self.hand
         elif returns == "new":
             return drawn
 
 
     def draw_specific_cards(self,cards_to_pull,deck):
-        self.hand += deck.draw_specific_cards(cards_to_pull)
+        self.add_cards(deck.draw_specific_cards(cards_to_pull))
+
+
+    def to_state(self):
+
+        pair_rank = None
+        if len(self.hand) == 2 and self.hand[0].rank == self.hand[1].rank:
+            pair_rank = self.hand[0].rank
+        return HandState(self.hard_total,self.aces,pair_rank)
+
+
+
+# Deck and Hand are the suited, card-by-card view used by gui.py and Interpreter. 
+# The simulations only need how many of each rank remain and the hand's hard total, 
+# so they run on the two classes below, which copy and draw without deepcopy.
+# A full shoe of n_decks decks is just a bigger count per rank, so copying, drawing and 
+# the exact and simulated odds cost the same for 8 decks as for 1. Penetration is a 
+# partially depleted vector: pass the cards already dealt as `dealt`, either 13 counts 
+# in card_ranks order or a {rank: count} dict, e.g. CountDeck(n_decks=6,dealt={"10":20}).
+class CountDeck:
+
+    def __init__(self,counts=None,n_decks:int=1,dealt=None):
+
+        if counts is None:
+            counts = np.full(len(card_ranks),len(card_suits)*n_decks)
+        self.counts = np.array(counts,dtype=np.int64)
+        self.n_decks = n_decks
+        if dealt is not None:
+            if isinstance(dealt,dict):
+                dealt_counts = np.zeros(len(card_ranks),dtype=np.int64)
+                for rank,n in dealt.items():
+                    dealt_counts[rank_index[str(rank)]] += n
+                dealt = dealt_counts
+            self.counts -= np.asarray(dealt,dtype=np.int64)
+            if (self.counts < 0).any():
+                raise ValueError("more cards dealt of a rank than the shoe holds")
+        self.n = int(self.counts.sum())
+
+
+    @classmethod
+    def from_deck(cls,deck):
+        return deck.to_count_deck()
+
+
+    def __len__(self):
+        return self.n
+
+
+    def copy(self):
+
+        new = CountDeck.__new__(CountDeck)
+        new.counts = self.counts.copy()
+        new.n = self.n
+        new.n_decks = self.n_decks
+        return new
+
+
+    # share of the shoe already dealt
+    def get_penetration(self):
+        return 1 - self.n/(len(standard_cards)*self.n_decks)
+
+
+    # draws without replacement; rng is anything with randrange (e.g. random.Random(seed))
+    # or a numpy Generator
+    def draw_random_rank(self,rng=random):
+
+        if self.n == 0:
+            raise ValueError("no cards remain in this deck")
+        if isinstance(rng,np.random.Generator):
+            k = int(rng.integers(self.n))
+        else:
+            k = rng.randrange(self.n)
+        i = int(np.searchsorted(np.cumsum(self.counts),k,side="right"))
+        self.counts[i] -= 1
+        self.n -= 1
+        return i
+
+
+    def remove_rank(self,rank):
+
+        i = rank_index[str(rank)]
+        if self.counts[i] == 0:
+            raise ValueError(f"no cards of rank {rank} remain in this deck")
+        self.counts[i] -= 1
+        self.n -= 1
+        return i
+
+
+    def get_value_counts(self):
+        return np.bincount(rank_value_classes,weights=self.counts,minlength=len(value_classes)).astype(np.int64)
+
+
+
+# pair_rank is the rank of a two-card pair, the one hand that can be split; the totals 
+# alone can't say whether 16 is 8+8 or 10+6
+class HandState:
+
+    bust_threshold = Hand.bust_threshold
+
+    def __init__(self,hard_total=0,aces=0,pair_rank=None):
+
+        self.hard_total = hard_total
+        self.aces = aces
+        self.pair_rank = pair_rank
+
+
+    @classmethod
+    def from_hand(cls,hand):
+        return hand.to_state()
+
+
+    def copy(self):
+        return HandState(self.hard_total,self.aces,self.pair_rank)
+
+
+    # a hand that takes another card is no longer a pair that can be split
+    def add_rank(self,rank_i):
+
+        self.hard_total += int(rank_hard_values[rank_i])
+        self.aces += int(rank_i == rank_index["A"])
+        self.pair_rank = None
+        return self
+
+
+    def draw_random_cards(self,number,deck,rng=random):
+
+        for _ in range(number):
+            self.add_rank(deck.draw_random_rank(rng))
+        return self
+
+
+    def get_hand_value(self):
+        return score_hard_total(self.hard_total,self.aces,self.bust_threshold)
+
+
+    def is_soft(self):
+        return self.aces > 0 and self.get_hand_value() != self.hard_total
+
+
+def as_count_deck(deck):
+
+    if isinstance(deck,CountDeck):
+        return deck
+    return deck.to_count_deck()
+
+
+def as_hand_state(hand):
+
+    if isinstance(hand,HandState):
+        return hand
+    return hand.to_state()
+
+
+# a hand and what is left of the shoe once its cards and the dealt cards are out, from 
+# lists of ranks (e.g. ["10","6"] and ["5","K"]), as logged or sent over the wire
+def state_from_ranks(hand_ranks,dealt_ranks=(),n_decks=1):
+
+    if not len(hand_ranks):
+        raise ValueError("hand needs at least one card")
+    out = np.zeros(len(card_ranks),dtype=np.int64)
+    hand = HandState()
+    for i,rank in enumerate(list(hand_ranks) + list(dealt_ranks)):
+        rank = str(rank).strip().upper()
+        if rank not in rank_index:
+            raise ValueError(f"unknown rank {rank}, use one of {card_ranks}")
+        out[rank_index[rank]] += 1
+        if i < len(hand_ranks):
+            hand.add_rank(rank_index[rank])
+    hand_ranks = [str(rank).strip().upper() for rank in hand_ranks]
+    if len(hand_ranks) == 2 and hand_ranks[0] == hand_ranks[1]:
+        hand.pair_rank = hand_ranks[0]
+    return hand, CountDeck(n_decks=n_decks,dealt=out)
 
 
 
@@ -251,72 +546,675 @@ class Interpreter:
         return self.statement
 
 
-def simulate_hand_draw(number_drawn=2,hand=None,deck=None):
+# counters, per-phase timers and chunk-boundary callbacks for the simulation loops. pass
+# one as instrument= to any of them; the loops only look at it between chunks, and with
+# the default None they skip all of it. callbacks are called as callback(instrument,event)
+# with event = {"loop":name,"done":iterations so far,"total":iterations}
+class Instrumentation:
+
+    def __init__(self,callbacks=()):
+
+        self.callbacks = list(callbacks)
+        self.counters = dict()
+        self.timers = dict()
+        self.chunks = dict()
+        self.started = perf_counter()
+
+
+    def count(self,name,n=1):
+        self.counters[name] = self.counters.get(name,0) + n
+
+
+    # adds the seconds since start (a perf_counter reading) to a phase, e.g. "deal"
+    def add_time(self,phase,start):
+        self.timers[phase] = self.timers.get(phase,0.) + perf_counter() - start
+
+
+    def chunk_done(self,loop,done,total):
+
+        self.chunks[loop] = self.chunks.get(loop,0) + 1
+        event = {"loop":loop,"done":done,"total":total}
+        for callback in self.callbacks:
+            callback(self,event)
+
+
+    def elapsed(self):
+        return perf_counter() - self.started
+
+
+    def to_dict(self):
+
+        elapsed = self.elapsed()
+        rates = {
+            f"{name}_per_sec":n/elapsed for name,n in self.counters.items()
+            if elapsed > 0 and not name.startswith("cache_")
+            }
+        lookups = self.counters.get("cache_hits",0) + self.counters.get("cache_misses",0)
+        if lookups:
+            rates["cache_hit_rate"] = self.counters.get("cache_hits",0)/lookups
+        return {
+            "elapsed":elapsed,
+            "counters":dict(self.counters),
+            "timers":dict(self.timers),
+            "chunks":dict(self.chunks),
+            "rates":rates
+            }
+
+
+    def to_json(self,**kwargs):
+        return json.dumps(self.to_dict(),**kwargs)
+
+
+# callback printing how far a loop has got, what track=True shows
+def print_progress(instrument,event):
+    print(f"{event['loop']}: {event['done']} iterations \
+({round(100*event['done']/event['total'],1)}%) complete")
+
+
+# loops report progress this often, about every 5%
+def progress_chunk_size(niters):
+    return max(1,niters//20)
+
+
+# the instrument a loop should use: the caller's, or for track=True one that prints progress
+def tracking_instrument(instrument,track):
+
+    if instrument is None and track:
+        return Instrumentation(callbacks=[print_progress])
+    return instrument
+
+
+def simulate_hand_draw(number_drawn=2,hand=None,deck=None,rng=random):
     
     if deck is not None:
-        deck = deepcopy(deck)
+        deck = as_count_deck(deck).copy()
     else:
-        deck = Deck()
+        deck = CountDeck()
 
     if hand is not None:
-        hand = deepcopy(hand)
-        hand.draw_random_cards(number_drawn,deck)
-        hand_value = hand.get_hand_value()
+        hand = as_hand_state(hand).copy()
     else:
-        hand_value = Hand(deck.shuffle("self"),number_drawn).get_hand_value()
+        hand = HandState()
+    hand.draw_random_cards(number_drawn,deck,rng)
 
-    return hand_value
+    return hand.get_hand_value()
 
 
-def simulate_hand_draws(number_drawn=2,niters=1e4,hand=None,deck=None,track=True):
+def simulate_hand_draws(number_drawn=2,niters=1e4,hand=None,deck=None,track=True,rng=random,
+                        instrument=None):
     
     niters = int(niters)
+    instrument = tracking_instrument(instrument,track)
+    # convert once, each draw then only copies the count vector
+    if deck is not None:
+        deck = as_count_deck(deck)
+    if hand is not None:
+        hand = as_hand_state(hand)
     hand_draws = list()
-    for i in range(niters):
-        if track: # progress tracker 
-            marg = round(niters)/100
-            perc = i/marg
-            if niters % 100 == 0:
-                if perc % 5 == 0:
-                    print(f"{i} iterations ({perc}%) complete")
-        hand_draws.append(simulate_hand_draw(number_drawn,hand=hand,deck=deck))
+    chunk_size = progress_chunk_size(niters)
+    for start in range(0,niters,chunk_size):
+        size = min(chunk_size,niters-start)
+        if instrument is None:
+            hand_draws += [simulate_hand_draw(number_drawn,hand,deck,rng) for _ in range(size)]
+            continue
+        t = perf_counter()
+        hand_draws += [simulate_hand_draw(number_drawn,hand,deck,rng) for _ in range(size)]
+        instrument.add_time("deal",t)
+        instrument.count("deals",size)
+        instrument.chunk_done("simulate_hand_draws",start+size,niters)
     
     return hand_draws
 
 
+# hand value distributions are held as dense histograms: entry v of a length n_totals array
+# is the count or probability of value v. outcomes are arrays in outcome_keys order. the
+# public functions still hand back the {value:p} and {"win":p,...} dicts
+n_totals = 32 # long enough for the usual draws; dict_to_hist and compile_hist grow past it
+outcome_keys = ["win","lose","draw","bust"]
+
+
+def compile_hist(hand_draws,normalize=True):
+
+    hist = np.bincount(np.asarray(hand_draws,dtype=np.int64),minlength=n_totals)
+    if normalize:
+        hist = hist/hist.sum()
+    return hist
+
+
+def hist_to_dict(hist):
+
+    values = np.flatnonzero(hist)
+    return dict(zip([int(value) for value in values],hist[values]))
+
+
+def dict_to_hist(value_p_dict):
+
+    hist = np.zeros(max([n_totals] + [int(value)+1 for value in value_p_dict]))
+    for value,p in value_p_dict.items():
+        hist[value] += p
+    return hist
+
+
+def outcomes_to_dict(outcomes):
+    return {k:float(p) for k,p in zip(outcome_keys,outcomes)}
+
+
 # take a list of scores from simulate functions and get probability of each score as a dictionary
 def compile_probs(hand_draws,normalize=True):
-    
-    values, counts = np.unique(np.array(hand_draws),return_counts=True)
-    if normalize:
-        counts = counts/np.sum(counts)
-    values = [int(value) for value in values]
-    return dict(zip(values, counts))
+    return hist_to_dict(compile_hist(hand_draws,normalize))
+
+
+# numpy Generator for the vectorized engine from whatever rng the caller passed
+# (None, the random module, an int seed, a random.Random or a Generator), so seeds carry over
+def as_np_rng(rng=None):
+
+    if isinstance(rng,np.random.Generator):
+        return rng
+    if isinstance(rng,random.Random):
+        return np.random.default_rng(rng.getrandbits(64))
+    if isinstance(rng,(int,np.integer,np.random.SeedSequence)):
+        return np.random.default_rng(rng)
+    return np.random.default_rng()
+
+
+# k distinct positions out of N for each of `size` deals, as k column arrays: pick the u-th 
+# unused position by stepping u past earlier picks in ascending order, so no N-wide keys 
+# or shuffles are needed. antithetic=True makes the second half of the deals the mirror 
+# image (position N-1-p) of the first half
+def sample_positions(N,k,size,rng,antithetic=False):
+
+    picks = list()
+    half = (size+1)//2 if antithetic else size
+    for j in range(k):
+        u = rng.integers(0,N-j,size=half)
+        if antithetic:
+            u = np.concatenate([u,(N-j-1)-u])[:size]
+        earlier = np.sort(np.stack(picks,axis=1),axis=1).T if j > 1 else picks
+        for column in earlier:
+            u += (u >= column)
+        picks.append(u)
+    return picks
+
+
+# score many hands at once, same ace logic as score_hard_total
+def score_hard_totals(hard_totals,aces,bust_threshold=22):
+
+    soft_totals = hard_totals + 10
+    return np.where((aces > 0) & (soft_totals < bust_threshold),soft_totals,hard_totals)
+
+
+# each card drawn as a code: its hard value plus 64 per ace, so a single gather and add 
+# per drawn card tracks both the hard total and the ace count. returns one array of 
+# codes per card position, `size` deals long. cards are laid out from 2 up to ace, so 
+# mirrored (antithetic) positions pair low cards with high ones
+def deal_card_codes(deck,number_drawn,size,rng,antithetic=False):
+
+    card_slots = np.repeat(np.arange(len(card_ranks)),deck.counts)
+    card_codes = rank_hard_values[card_slots] + 64*(card_slots == rank_index["A"])
+    return [
+        card_codes[positions] 
+        for positions in sample_positions(deck.n,number_drawn,size,rng,antithetic)
+        ]
+
+
+def score_codes(codes,bust_threshold=22):
+    return score_hard_totals(codes % 64,codes // 64,bust_threshold)
+
+
+# win/lose/draw/bust counts (outcome_keys order) of player values against house values
+def tally_outcomes(hand_values,house_values,bust_threshold=22):
+
+    bust = hand_values >= bust_threshold
+    return np.array([
+        np.count_nonzero(~bust & (hand_values > house_values)),
+        np.count_nonzero(~bust & (hand_values < house_values)),
+        np.count_nonzero(~bust & (hand_values == house_values)),
+        np.count_nonzero(bust)
+        ])
+
+
+# vectorized simulate_hand_draws: draw every deal's cards from the remaining rank counts
+# in one batch and return the hand values as an array
+def simulate_hand_draws_vectorized(number_drawn=2,niters=1e6,hand=None,deck=None,
+                                   rng=None,chunk_size=2**20,instrument=None):
+
+    niters = int(niters)
+    rng = as_np_rng(rng)
+    deck = as_count_deck(deck) if deck is not None else CountDeck()
+    hand = as_hand_state(hand) if hand is not None else HandState()
+    if deck.n < number_drawn:
+        raise ValueError(f"cannot draw {number_drawn} cards from a deck of {deck.n}")
+
+    hand_values = np.empty(niters,dtype=np.int64)
+    for start in range(0,niters,chunk_size):
+        size = min(chunk_size,niters-start)
+        if instrument is None:
+            codes = sum(deal_card_codes(deck,number_drawn,size,rng),hand.hard_total + 64*hand.aces)
+            hand_values[start:start+size] = score_codes(codes,hand.bust_threshold)
+            continue
+        t = perf_counter()
+        codes = sum(deal_card_codes(deck,number_drawn,size,rng),hand.hard_total + 64*hand.aces)
+        instrument.add_time("deal",t)
+        t = perf_counter()
+        hand_values[start:start+size] = score_codes(codes,hand.bust_threshold)
+        instrument.add_time("score",t)
+        instrument.count("deals",size)
+        instrument.chunk_done("simulate_hand_draws_vectorized",start+size,niters)
+
+    return hand_values
+
+
+# vectorized simulate_prob_dist_from_deck, returns the same dict as compile_probs
+def simulate_prob_dist_vectorized(deck,number_drawn=2,niters=1e6,hand=None,
+                                  normalize=True,rng=None,instrument=None):
+    return hist_to_dict(simulate_hist_vectorized(deck,number_drawn,niters,hand,normalize,rng,instrument))
+
+
+def simulate_hist_vectorized(deck,number_drawn=2,niters=1e6,hand=None,
+                             normalize=True,rng=None,instrument=None):
+
+    hand_values = simulate_hand_draws_vectorized(
+        number_drawn=number_drawn,niters=niters,hand=hand,deck=deck,rng=rng,instrument=instrument
+        )
+    t = perf_counter()
+    hist = compile_hist(hand_values,normalize)
+    if instrument is not None:
+        instrument.add_time("aggregate",t)
+    return hist
 
 
 # if the dealer draws n cards, what's the probability distribution?
-def simulate_prob_dist_from_deck(deck,number_drawn=2,niters=1e4,track=True):
-
-    return compile_probs(
-        simulate_hand_draws(
-            number_drawn=number_drawn,
-            deck=deck,
-            niters=niters,
-            track=track
-            )
+def simulate_prob_dist_from_deck(deck,number_drawn=2,niters=1e4,track=True,rng=random,
+                                 vectorized=False,instrument=None):
+    return hist_to_dict(simulate_hist_from_deck(deck,number_drawn,niters,track,rng,vectorized,instrument))
+
+
+# simulate_prob_dist_from_deck as a histogram
+def simulate_hist_from_deck(deck,number_drawn=2,niters=1e4,track=True,rng=random,
+                            vectorized=False,instrument=None):
+
+    if vectorized:
+        return simulate_hist_vectorized(deck,number_drawn,niters,rng=rng,instrument=instrument)
+
+    instrument = tracking_instrument(instrument,track)
+    hand_draws = simulate_hand_draws(
+        number_drawn=number_drawn,
+        deck=deck,
+        niters=niters,
+        track=False,
+        rng=rng,
+        instrument=instrument
         )
+    if instrument is None:
+        return compile_hist(hand_draws)
+    t = perf_counter()
+    hist = compile_hist(hand_draws)
+    instrument.add_time("aggregate",t)
+    return hist
 
 # given your particular hand and random draws by the house, what's the probability of different outcomes?
-def compare_prob_hand_to_house(hand,deck,n_drawn_by_house=2,house_niters=1e4,track=True): # currently redundant to include both 
+def compare_prob_hand_to_house(hand,deck,n_drawn_by_house=2,house_niters=1e4,track=True,rng=random,
+                               vectorized=False,instrument=None): # currently redundant to include both 
     
+    return outcomes_to_dict(_hand_to_house_outcomes(
+        hand,deck,n_drawn_by_house,house_niters,track,rng,vectorized,instrument
+        ))
+
+
+def _hand_to_house_outcomes(hand,deck,n_drawn_by_house,house_niters,track,rng,vectorized,
+                            instrument):
+
     hand_value = hand.get_hand_value()
-    house_value_p_dict = simulate_prob_dist_from_deck(
-        deck=deck,number_drawn=n_drawn_by_house,niters=house_niters,track=track
+    if hand_value >= hand.bust_threshold: # no need to deal the house
+        return compare_value_to_hist(hand_value,None,hand.bust_threshold)
+    house_hist = simulate_hist_from_deck(
+        deck=deck,number_drawn=n_drawn_by_house,niters=house_niters,track=track,rng=rng,
+        vectorized=vectorized,instrument=instrument
         )
+    return compare_value_to_hist(hand_value,house_hist,hand.bust_threshold)
+
+
+# given you randomly draw a card on top of your existing hand, what are the probabilities of different outcomes
+def compare_prob_hit_to_house(base_hand,deck,n_drawn_by_house=2,
+                              hand_niters=1e2,house_niters=1e2,
+                              track_outer=True,track_inner=False,rng=random,vectorized=False,
+                              instrument=None):
+    
+    hand_niters=int(hand_niters)
+    base_hand = as_hand_state(base_hand)
+    deck = as_count_deck(deck)
+    if vectorized: # one Generator for every inner batch rather than reseeding each one
+        rng = as_np_rng(rng)
+    outer_instrument = tracking_instrument(instrument,track_outer)
+    inner_instrument = tracking_instrument(instrument,track_inner)
+    # every hit iteration's outcome probabilities, summed
+    outcomes = np.zeros(len(outcome_keys))
+    chunk_size = progress_chunk_size(hand_niters)
+    for start in range(0,hand_niters,chunk_size):
+        size = min(chunk_size,hand_niters-start)
+        for _ in range(size):
+            deck_i = deck.copy()
+            hit_hand = base_hand.copy().draw_random_cards(1,deck_i,rng)
+            outcomes += _hand_to_house_outcomes(
+                hit_hand,deck_i,n_drawn_by_house,house_niters,False,rng,vectorized,inner_instrument
+                )
+        if outer_instrument is not None:
+            outer_instrument.count("hit_iterations",size)
+            outer_instrument.chunk_done("compare_prob_hit_to_house",start+size,hand_niters)
+
+    return outcomes_to_dict(outcomes/hand_niters)
+
+
+# runs one chunk of outer hit iterations in a worker process with its own seeded stream
+def _hit_chunk(args):
+
+    base_hand, deck, n_drawn_by_house, chunk_niters, house_niters, seed_seq, vectorized = args
+    return compare_prob_hit_to_house(
+        base_hand,deck,n_drawn_by_house,chunk_niters,house_niters,
+        track_outer=False,track_inner=False,
+        rng=np.random.default_rng(seed_seq),vectorized=vectorized
+        )
+
+
+# process pools kept between calls, one per worker count, since starting one costs more
+# than a whole serial hit estimate
+hit_pools = dict()
+
+
+def get_hit_pool(n_workers=None):
+
+    if n_workers not in hit_pools:
+        hit_pools[n_workers] = ProcessPoolExecutor(max_workers=n_workers)
+    return hit_pools[n_workers]
+
+
+@atexit.register
+def shutdown_hit_pools():
+
+    for pool in hit_pools.values():
+        pool.shutdown(cancel_futures=True)
+    hit_pools.clear()
+
+
+# compare_prob_hit_to_house with the outer iterations spread over a process pool: executor
+# if given (the caller's to keep and shut down), otherwise a shared one from get_hit_pool.
+# the iterations are cut into small fixed-size chunks, so there are enough to keep many 
+# workers busy, each seeded from its own child of SeedSequence(seed), so a given seed 
+# gives the same answer for any n_workers
+def compare_prob_hit_to_house_parallel(base_hand,deck,n_drawn_by_house=2,
+                                       hand_niters=1e2,house_niters=1e2,
+                                       n_workers=None,seed=None,chunk_size=2,
+                                       vectorized=False,instrument=None,executor=None):
+
+    hand_niters = int(hand_niters)
+    base_hand = as_hand_state(base_hand)
+    deck = as_count_deck(deck)
+    chunk_niters = [min(chunk_size,hand_niters-start) for start in range(0,hand_niters,chunk_size)]
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(chunk_niters))
+    tasks = [
+        (base_hand,deck,n_drawn_by_house,n,house_niters,seed_seq,vectorized)
+        for n,seed_seq in zip(chunk_niters,seed_seqs)
+        ]
+
+    # workers can't share the instrument, so it hears about each chunk as it comes back.
+    # each chunk's outcomes are an average over its iterations, so they merge weighted
+    outcomes = np.zeros(len(outcome_keys))
+    if executor is None and n_workers == 1:
+        results = map(_hit_chunk,tasks)
+    else: # map keeps chunk order, so merging is deterministic too
+        pool = executor if executor is not None else get_hit_pool(n_workers)
+        results = pool.map(_hit_chunk,tasks)
+    done = 0
+    for d,n in zip(results,chunk_niters):
+        outcomes += n*np.array([d[k] for k in outcome_keys])
+        done += n
+        if instrument is not None:
+            instrument.count("hit_iterations",n)
+            instrument.chunk_done("compare_prob_hit_to_house_parallel",done,hand_niters)
+
+    return outcomes_to_dict(outcomes/hand_niters)
+
+
+# the hard total (aces as 1) and number of aces in a hand, the only things scoring depends on
+def get_hard_total_and_aces(hand):
+
+    return hand.hard_total, hand.aces
+
+
+# same result as Hand.get_hand_value: at most one ace can ever count as 11 without busting
+def score_hard_total(hard_total,aces,bust_threshold=22):
+
+    if aces > 0 and (hard_total + 10) < bust_threshold:
+        return hard_total + 10
+    return hard_total
+
+
+# remaining cards by value class (see value_classes), suits and face ranks don't change odds
+def get_value_counts(deck):
+
+    return as_count_deck(deck).get_value_counts()
+
+
+# score of every ordered two-card draw, indexed by value class
+_pair_scores = np.array([
+    [score_hard_total(v1+v2,int(v1==1)+int(v2==1)) for v2 in value_classes]
+    for v1 in value_classes
+    ])
+
+
+# exact histogram of the value of two cards drawn from the remaining counts. ordered pairs:
+# P(i then j) = K_i * (K_j - [i==j]) / (N * (N-1))
+def exact_pair_hist(counts):
+
+    counts = np.asarray(counts)
+    N = int(counts.sum())
+    pair_p = (np.outer(counts,counts) - np.diag(counts)) / (N*(N-1))
+    return np.bincount(_pair_scores.ravel(),weights=pair_p.ravel(),minlength=n_totals)
+
+
+# exact distribution of the house's hand value when it draws n cards from the remaining counts,
+# i.e. the multivariate version of p_hg summed over every combination of value classes
+def exact_prob_dist_from_counts(counts,number_drawn=2,hard_total=0,aces=0):
+
+    counts = np.asarray(counts)
+    N = int(counts.sum())
+    if N < number_drawn:
+        raise ValueError(f"cannot draw {number_drawn} cards from a deck of {N}")
+
+    if number_drawn == 2 and hard_total == 0:
+        return {int(v):float(p) for v,p in enumerate(exact_pair_hist(counts)) if p > 0}
+
+    if number_drawn == 0:
+        return {score_hard_total(hard_total,aces):1.}
+
+    value_p_dict = dict()
+    for i in np.flatnonzero(counts):
+        p_card = p_hg(int(counts[i]),1,N,1)
+        counts_i = counts.copy()
+        counts_i[i] -= 1
+        sub_d = exact_prob_dist_from_counts(
+            counts_i,number_drawn-1,hard_total+int(value_classes[i]),aces+int(i==0)
+            )
+        for v,p in sub_d.items():
+            value_p_dict[v] = value_p_dict.get(v,0.) + p_card*p
+    return value_p_dict
+
+
+# how the house plays: "two_cards" is this game's original rule (the house takes exactly
+# two cards), "hit_soft_17" and "stand_soft_17" have the dealer draw to 17 or more, 
+# hitting or standing on a soft 17
+house_rules = ["two_cards","hit_soft_17","stand_soft_17"]
+dealer_bust_value = 22 # every dealer bust is recorded as this value
+
+
+def dealer_stands(value,soft,house_rule):
+
+    if value > 17:
+        return True
+    if value == 17:
+        return not (soft and house_rule == "hit_soft_17")
+    return False
+
+
+# transposition table for dealer_prob_dist_from_counts: the same (remaining counts, dealer 
+# total) state is reached through many card orders and across the hit branch's decks
+dealer_transposition_table = dict()
+dealer_table_maxsize = 10**6
+
+
+# exact distribution of the dealer's final total when it draws to 17 from the remaining 
+# value counts. A given set of dealer cards has the same probability in every order it 
+# can be drawn, so the answer is a sum over the dealer's possible final hands 
+# (dealer_final_hands). Shoes too small for the longest final hand fall back to recursion 
+# over the next card with every state solved only once.
+def dealer_prob_dist_from_counts(counts,house_rule="hit_soft_17"):
+
+    if house_rule not in house_rules[1:]:
+        raise ValueError(f"{house_rule} is not a dealer-draw rule, use one of {house_rules[1:]}")
+    if len(dealer_transposition_table) > dealer_table_maxsize:
+        dealer_transposition_table.clear()
+    counts = tuple(int(n) for n in counts)
+    N = sum(counts)
+    if N < 2:
+        raise ValueError(f"cannot draw 2 cards from a deck of {N}")
+
+    key = (house_rule,counts)
+    value_p_dict = dealer_transposition_table.get(key)
+    if value_p_dict is None:
+        hands = dealer_final_hands(house_rule)
+        if N >= hands["max_cards"]:
+            value_p_dict = _dealer_dist_from_final_hands(counts,hands)
+        else:
+            value_p_dict = _dealer_dist(counts,0,0,0,house_rule)
+        dealer_transposition_table[key] = value_p_dict
+    return dict(value_p_dict)
+
+
+# every hand the dealer can finish with under a rule, as value-class multisets, with the 
+# number of draw orders that reach it without the dealer stopping earlier. Built once per 
+# rule by extending still-drawing hands one card at a time, merging identical multisets
+_dealer_final_hands = dict()
+
+
+def dealer_final_hands(house_rule):
+
+    if house_rule in _dealer_final_hands:
+        return _dealer_final_hands[house_rule]
+
+    finals = dict()
+    drawing = {(0,)*len(value_classes):1}
+    while drawing:
+        next_drawing = dict()
+        for multiset,orders in drawing.items():
+            for i in range(len(value_classes)):
+                hand = multiset[:i] + (multiset[i]+1,) + multiset[i+1:]
+                hard_total = sum([n*int(v) for n,v in zip(hand,value_classes)])
+                value = score_hard_total(hard_total,hand[0])
+                stops = value >= dealer_bust_value or (
+                    sum(hand) >= 2 and dealer_stands(value,value != hard_total,house_rule)
+                    )
+                target = finals if stops else next_drawing
+                target[hand] = target.get(hand,0) + orders
+        drawing = next_drawing
+
+    multisets = np.array(list(finals.keys()))
+    hands = {
+        "multisets":multisets,
+        "n_cards":multisets.sum(axis=1),
+        "values":np.array([
+            min(score_hard_total(int(m @ value_classes),int(m[0])),dealer_bust_value) for m in multisets
+            ]),
+        "orders":np.array(list(finals.values()),dtype=np.float64),
+        "max_cards":int(multisets.sum(axis=1).max())
+        }
+    _dealer_final_hands[house_rule] = hands
+    return hands
+
+
+# P(final hand) = orders * prod_i K_i!/(K_i-m_i)! / (N!/(N-k)!) for all final hands at once
+def _dealer_dist_from_final_hands(counts,hands):
+
+    multisets = hands["multisets"]
+    max_m = int(multisets.max())
+    counts = np.array(counts,dtype=np.float64)
+    # falling factorials K_i (K_i-1) ... (K_i-m+1) for m = 0..max_m, zero once m > K_i
+    falling = np.cumprod(
+        np.hstack([np.ones((len(counts),1)),np.clip(counts[:,None] - np.arange(max_m),0,None)]),axis=1
+        )
+    N = counts.sum()
+    falling_N = np.cumprod(np.hstack([1.,N - np.arange(hands["max_cards"])]))
+    p = hands["orders"]*falling[np.arange(len(counts)),multisets].prod(axis=1)/falling_N[hands["n_cards"]]
+    probs = np.bincount(hands["values"],weights=p)
+    return {int(v):float(q) for v,q in enumerate(probs) if q > 0}
+
+
+def _dealer_dist(counts,hard_total,aces,n_cards,house_rule):
+
+    key = (house_rule,counts,hard_total,aces > 0,min(n_cards,2))
+    value_p_dict = dealer_transposition_table.get(key)
+    if value_p_dict is not None:
+        return value_p_dict
+
+    value = score_hard_total(hard_total,aces)
+    N = sum(counts)
+    if value >= dealer_bust_value:
+        value_p_dict = {dealer_bust_value:1.}
+    elif (n_cards >= 2 and dealer_stands(value,value != hard_total,house_rule)) or N == 0:
+        value_p_dict = {value:1.}
+    else:
+        value_p_dict = dict()
+        for i,count in enumerate(counts):
+            if count == 0:
+                continue
+            counts_i = counts[:i] + (count-1,) + counts[i+1:]
+            sub_d = _dealer_dist(counts_i,hard_total+i+1,aces+(i == 0),n_cards+1,house_rule)
+            p_card = count/N
+            for v,p in sub_d.items():
+                value_p_dict[v] = value_p_dict.get(v,0.) + p_card*p
+
+    dealer_transposition_table[key] = value_p_dict
+    return value_p_dict
+
+
+# the house's value distribution under any house_rule
+def exact_house_dist(counts,n_drawn_by_house=2,house_rule="two_cards"):
+
+    if house_rule == "two_cards":
+        return exact_prob_dist_from_counts(counts,n_drawn_by_house)
+    return dealer_prob_dist_from_counts(counts,house_rule)
+
+
+# exact_house_dist as a histogram
+def exact_house_hist(counts,n_drawn_by_house=2,house_rule="two_cards"):
+
+    if house_rule == "two_cards" and n_drawn_by_house == 2:
+        if int(np.sum(counts)) < 2:
+            raise ValueError(f"cannot draw 2 cards from a deck of {int(np.sum(counts))}")
+        return exact_pair_hist(counts)
+    return dict_to_hist(exact_house_dist(counts,n_drawn_by_house,house_rule))
+
+
+# compare_value_to_house against a histogram of house values, as an outcomes array. with
+# cum[v] the chance the house has v or less, the hand wins on everything below it plus 
+# every house bust, and loses on the non-bust values above it
+def compare_value_to_hist(hand_value,house_hist,bust_threshold=22):
+
+    if hand_value >= bust_threshold:
+        return np.array([0.,0.,0.,1.])
+    cum = np.cumsum(house_hist)
+    below = cum[hand_value-1] if hand_value > 0 else 0.
+    not_bust = cum[bust_threshold-1]
+    return np.array([below + cum[-1] - not_bust,not_bust - cum[hand_value],house_hist[hand_value],0.])
+
+
+# win/lose/draw/bust for a fixed hand value against a distribution of house values.
+# a house that busts loses to any hand that hasn't
+def compare_value_to_house(hand_value,house_value_p_dict,bust_threshold=22):
+
     win_p, lose_p, draw_p, bust_p = 0.,0.,0.,0.
-    if hand_value < hand.bust_threshold:
+    if hand_value < bust_threshold:
         for house_value,p in house_value_p_dict.items():
-            if hand_value > house_value:
+            if hand_value > house_value or house_value >= bust_threshold:
                 win_p += p
             elif hand_value < house_value:
                 lose_p += p
@@ -325,82 +1223,592 @@ def compare_prob_hand_to_house(hand,deck,n_drawn_by_house=2,house_niters=1e4,tra
     else:
         bust_p += 1.
 
-    prob_d = {"win":win_p,"lose":lose_p,"draw":draw_p,"bust":bust_p}
+    return {"win":win_p,"lose":lose_p,"draw":draw_p,"bust":bust_p}
 
-    return prob_d
 
+# exact counterpart of compare_prob_hand_to_house, no sampling
+def exact_prob_hand_to_house(hand,deck,n_drawn_by_house=2,house_rule="two_cards"):
 
-def flatten(l):
+    hand_value = hand.get_hand_value()
+    if hand_value >= hand.bust_threshold:
+        return outcomes_to_dict(compare_value_to_hist(hand_value,None,hand.bust_threshold))
+    house_hist = exact_house_hist(get_value_counts(deck),n_drawn_by_house,house_rule)
+    return outcomes_to_dict(compare_value_to_hist(hand_value,house_hist,hand.bust_threshold))
 
-    return [item for sublist in l for item in sublist]
 
+# exact counterpart of compare_prob_hit_to_house: weight each possible hit card by its
+# probability and compare the new hand to the house drawing from what is left
+def exact_prob_hit_to_house(base_hand,deck,n_drawn_by_house=2,house_rule="two_cards"):
 
-def reducer(accumulator, element):
+    counts = get_value_counts(deck)
+    N = int(counts.sum())
+    hard_total, aces = get_hard_total_and_aces(base_hand)
 
-    for key, value in element.items():
-        accumulator[key] = accumulator.get(key, 0) + value
-    return accumulator
+    outcomes = np.zeros(len(outcome_keys))
+    for i in np.flatnonzero(counts):
+        p_card = p_hg(int(counts[i]),1,N,1)
+        hit_value = score_hard_total(
+            hard_total+int(value_classes[i]),aces+int(i==0),base_hand.bust_threshold
+            )
+        if hit_value >= base_hand.bust_threshold:
+            house_hist = None
+        else:
+            counts_i = counts.copy()
+            counts_i[i] -= 1
+            house_hist = exact_house_hist(counts_i,n_drawn_by_house,house_rule)
+        outcomes += p_card*compare_value_to_hist(hit_value,house_hist,base_hand.bust_threshold)
 
+    return outcomes_to_dict(outcomes)
 
-# get unique keys from a list of dictionaries 
-def get_unique_d_keys(ds:list):
 
-    return sorted(list(set(flatten([list(i.keys()) for i in ds]))))
+# expected value of a result per unit bet: wins pay 1, losses and busts cost 1, draws push
+calc_expected_value = lambda d: d["win"] - d["lose"] - d["bust"]
 
+value_class_labels = ["A"] + [str(v) for v in value_classes[1:]]
 
-def avg_dicts(ds:list):
+# transposition table for the policy solver and get_action_values, keyed on (kind, 
+# house_rule, value counts, player hard total, has ace) where kind is "stand" for the 
+# value of standing and "best" for optimal play; entries are (expected value, action, 
+# outcome dict)
+policy_transposition_table = dict()
+policy_table_maxsize = 10**6
 
-    d_avg = reduce(reducer,ds,{})
-    ks=get_unique_d_keys(ds)
-    n=len(ds)
-    for k in ks:
-        sum_p=0.
-        for d in ds:
-            sum_p+=d.get(k,0)
-        avg_p=sum_p/n
-        d_avg[k]=avg_p
-    return d_avg
 
+def _stand_node(counts,hard_total,aces,house_rule,bust_threshold):
 
-# given you randomly draw a card on top of your existing hand, what are the probabilities of different outcomes
-def compare_prob_hit_to_house(base_hand,deck,n_drawn_by_house=2,
-                              hand_niters=1e2,house_niters=1e2,
-                              track_outer=True,track_inner=False):
-    
-    hand_niters=int(hand_niters)
-    p_ds = list()
-    for i in range(hand_niters):
-        if track_outer: # progress tracker 
-            marg = round(hand_niters)/100
-            perc = i/marg
-            if hand_niters % 100 == 0:
-                if perc % 5 == 0:
-                    print(f"{i} iterations ({perc}%) complete")
-
-        hit_hand = deepcopy(base_hand)
-        deck_i = deepcopy(deck)
-        hit_hand = hit_hand.draw_random_cards(1,deck_i,"self")
-        p_d = compare_prob_hand_to_house(
-            hit_hand,deck_i,n_drawn_by_house,house_niters, track=track_inner
+    key = ("stand",house_rule,counts,hard_total,aces > 0)
+    node = policy_transposition_table.get(key)
+    if node is not None:
+        return node
+
+    value = score_hard_total(hard_total,aces,bust_threshold)
+    if value >= bust_threshold:
+        node = (-1.,"bust",compare_value_to_house(value,{},bust_threshold))
+    else:
+        stay_d = compare_value_to_house(
+            value,exact_house_dist(np.array(counts),2,house_rule),bust_threshold
             )
-        p_ds.append(p_d)
-    d_avg = avg_dicts(p_ds)
-    
-    return d_avg
+        node = (calc_expected_value(stay_d),"stay",stay_d)
+
+    policy_transposition_table[key] = node
+    return node
+
+
+# expectimax over player states: stay is scored against the exact house distribution,
+# hit is the probability-weighted value of every next card played on optimally. hitting
+# is skipped when it can't win: even if every non-busting card won outright, its value 
+# would be at most 1 - 2*P(bust on the next card)
+def _player_node(counts,hard_total,aces,house_rule,bust_threshold):
+
+    key = ("best",house_rule,counts,hard_total,aces > 0)
+    node = policy_transposition_table.get(key)
+    if node is not None:
+        return node
+
+    node = _stand_node(counts,hard_total,aces,house_rule,bust_threshold)
+    if node[1] != "bust":
+        N = sum(counts)
+        if N > 2: # the house still needs its cards after a hit
+            p_bust_next = sum([
+                count for i,count in enumerate(counts) 
+                if count and score_hard_total(hard_total+i+1,aces+(i == 0),bust_threshold) >= bust_threshold
+                ])/N
+            if node[0] < 1 - 2*p_bust_next:
+                hit_ev, hit_d = _hit_node(counts,hard_total,aces,house_rule,bust_threshold)
+                if hit_ev > node[0]:
+                    node = (hit_ev,"hit",hit_d)
+
+    policy_transposition_table[key] = node
+    return node
+
+
+def _hit_node(counts,hard_total,aces,house_rule,bust_threshold):
+
+    N = sum(counts)
+    hit_ev = 0.
+    hit_d = {k:0. for k in outcome_keys}
+    for i,count in enumerate(counts):
+        if count == 0:
+            continue
+        p_card = count/N
+        child = _player_node(
+            counts[:i] + (count-1,) + counts[i+1:],hard_total+i+1,aces+(i == 0),
+            house_rule,bust_threshold
+            )
+        hit_ev += p_card*child[0]
+        for k,p in child[2].items():
+            hit_d[k] += p_card*p
+    return hit_ev, hit_d
+
+
+# what to do at every state reachable while following the policy, keyed on the sorted 
+# cards drawn since the starting hand (value class labels, "10" for any ten-valued card)
+def _collect_policy(counts,hard_total,aces,drawn,policy,house_rule,bust_threshold):
+
+    action = _player_node(counts,hard_total,aces,house_rule,bust_threshold)[1]
+    if action == "bust":
+        return
+    policy[drawn] = action
+    if action == "hit":
+        for i,count in enumerate(counts):
+            if count == 0:
+                continue
+            _collect_policy(
+                counts[:i] + (count-1,) + counts[i+1:],hard_total+i+1,aces+(i == 0),
+                tuple(sorted(drawn + (value_class_labels[i],))),policy,house_rule,bust_threshold
+                )
+
+
+# optimal stand/hit policy over any number of hits, maximising expected value. returns 
+# the first action, its expected value, the outcomes of staying now and of hitting now 
+# (then playing on optimally) and the full policy
+def solve_optimal_policy(hand,deck,house_rule="two_cards"):
+
+    if len(policy_transposition_table) > policy_table_maxsize:
+        policy_transposition_table.clear()
+    state = as_hand_state(hand)
+    counts = tuple(int(n) for n in get_value_counts(deck))
+    bust_threshold = state.bust_threshold
+
+    stay_d = _stand_node(counts,state.hard_total,state.aces,house_rule,bust_threshold)[2]
+    hit_ev, hit_d = _hit_node(counts,state.hard_total,state.aces,house_rule,bust_threshold)
+    ev, action, _ = _player_node(counts,state.hard_total,state.aces,house_rule,bust_threshold)
+    policy = dict()
+    _collect_policy(counts,state.hard_total,state.aces,(),policy,house_rule,bust_threshold)
+
+    return {
+        "action":action,
+        "ev":ev,
+        "stay":stay_d,
+        "hit":hit_d,
+        "ev_stay":calc_expected_value(stay_d),
+        "ev_hit":hit_ev,
+        "policy":policy
+        }
+
+
+# probability-weighted stand value after exactly one more card: a double down's 
+# outcomes, at single stake
+def _one_card_node(counts,hard_total,aces,house_rule,bust_threshold):
+
+    N = sum(counts)
+    ev = 0.
+    d = {k:0. for k in outcome_keys}
+    for i,count in enumerate(counts):
+        if count == 0:
+            continue
+        p_card = count/N
+        child = _stand_node(
+            counts[:i] + (count-1,) + counts[i+1:],hard_total+i+1,aces+(i == 0),
+            house_rule,bust_threshold
+            )
+        ev += p_card*child[0]
+        for k,p in child[2].items():
+            d[k] += p_card*p
+    return ev, d
+
+
+# expected value (per unit of the original bet) and outcomes of every legal action:
+#   stay, hit (then play on optimally), double (one card at twice the stake) and, for a 
+#   two-card pair (the state's pair_rank), split (each card starts its own hand at the 
+#   original stake, played on optimally; the two hands are valued independently against 
+#   the same remaining cards, so one sub-result serves both)
+# every action is read from the solver's shared state cache, so the extra actions mostly
+# land on states the hit/stay solve has already visited
+def get_action_values(hand,deck,house_rule="two_cards"):
+
+    if len(policy_transposition_table) > policy_table_maxsize:
+        policy_transposition_table.clear()
+    state = as_hand_state(hand)
+    counts = tuple(int(n) for n in get_value_counts(deck))
+    bust_threshold = state.bust_threshold
+    args = (house_rule,bust_threshold)
+
+    stay_ev, _, stay_d = _stand_node(counts,state.hard_total,state.aces,*args)
+    action_d = {"stay":dict(stay_d,ev=stay_ev)}
+    if state.get_hand_value() >= bust_threshold or sum(counts) <= 2:
+        return action_d
+
+    hit_ev, hit_d = _hit_node(counts,state.hard_total,state.aces,*args)
+    action_d["hit"] = dict(hit_d,ev=hit_ev)
+
+    double_ev, double_d = _one_card_node(counts,state.hard_total,state.aces,*args)
+    action_d["double"] = dict(double_d,ev=2*double_ev)
+
+    if state.pair_rank is not None:
+        pair_i = rank_index[state.pair_rank]
+        hand_ev, hand_d = _hit_node(
+            counts,int(rank_hard_values[pair_i]),int(pair_i == rank_index["A"]),*args
+            )
+        action_d["split"] = dict(hand_d,ev=2*hand_ev)
+
+    return action_d
+
+
+# the action with the highest expected value, from get_action_values or a 
+# get_hit_stay_probs result (without actions, stay and hit are valued from their outcomes)
+def get_best_action(action_d):
+
+    action_evs = {
+        action:action_d[action].get("ev",calc_expected_value(action_d[action]))
+        for action in ("stay","hit","double","split") if action in action_d
+        }
+    return max(action_evs,key=action_evs.get)
+
+
+# bounded least-recently-used store of get_hit_stay_probs results. Keys are canonical deck 
+# states: remaining value counts (suits and J/Q/K/10 are interchangeable for the odds), 
+# the hand's value and whether it is soft, which is all the stay and hit odds depend on.
+# Results with the other actions also depend on the pair's value, if the hand can split.
+# A sampled method's result is only worth keeping when a seed makes it reproducible, and
+# then the seed is part of the key (see is_cacheable).
+class RecommendationCache:
+
+    def __init__(self,maxsize=4096,path=None):
+
+        self.maxsize = maxsize
+        self.path = path
+        self.store = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+
+    @staticmethod
+    def make_key(hand,deck,method="exact",house_rule="two_cards",actions=False,seed=None):
+
+        state = as_hand_state(hand)
+        counts = get_value_counts(as_count_deck(deck))
+        pair = None
+        if actions and state.pair_rank is not None:
+            pair = int(rank_value_classes[rank_index[state.pair_rank]])
+        return (method,house_rule,tuple(int(n) for n in counts),state.get_hand_value(),state.is_soft(),
+                actions,pair,seed)
+
+
+    def __len__(self):
+        return len(self.store)
+
+
+    def __contains__(self,key):
+        return key in self.store
+
+
+    # returns None on a miss; hands back deep copies so callers can't alter cached results,
+    # nested ones like the optimal policy included
+    def get(self,key):
+
+        if key not in self.store:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.store.move_to_end(key)
+        return copy.deepcopy(self.store[key])
+
+
+    def put(self,key,hit_stay_d):
+
+        self.store[key] = copy.deepcopy(hit_stay_d)
+        self.store.move_to_end(key)
+        while len(self.store) > self.maxsize:
+            self.store.popitem(last=False)
+            self.evictions += 1
+
+
+    def clear(self):
+
+        self.store.clear()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+
+    def stats(self):
+
+        lookups = self.hits + self.misses
+        return {
+            "hits":self.hits,
+            "misses":self.misses,
+            "evictions":self.evictions,
+            "size":len(self.store),
+            "maxsize":self.maxsize,
+            "hit_rate":self.hits/lookups if lookups else 0.
+            }
+
+
+    # writes to a temporary file first so a crash never leaves a half-written cache
+    def save(self,path=None):
+
+        path = path if path is not None else self.path
+        if path is None:
+            raise ValueError("no path given to save the cache to")
+        tmp_path = path + ".tmp"
+        with open(tmp_path,"wb") as f:
+            pickle.dump(list(self.store.items()),f)
+        os.replace(tmp_path,path)
+
+
+    def load(self,path=None):
+
+        path = path if path is not None else self.path
+        with open(path,"rb") as f:
+            items = pickle.load(f)
+        for key,hit_stay_d in items:
+            self.put(key,hit_stay_d)
+        return self
+
+
+# shared by every get_hit_stay_probs call in this process unless another cache is passed
+hit_stay_cache = RecommendationCache()
+
+
+# methods whose result is fixed by the state alone
+deterministic_methods = ["exact","optimal"]
+
+
+# whether a result belongs in a cache: an unseeded sampled result is one draw among many, 
+# and handing it back again would pass the same noise off as a fresh estimate
+def is_cacheable(method,seed=None):
+    return method in deterministic_methods or seed is not None
 
 
 calc_gain_loss_ratio = lambda d: d["win"]/(d["lose"]+d["bust"])
 calc_p_win_sans_draws = lambda d: d["win"]/(d["win"]+d["lose"]+d["bust"])
 
 
+# interval for a binomial proportion that behaves at p near 0 or 1 and small n
+def wilson_interval(successes,n,z):
+
+    if n == 0:
+        return (0.,1.)
+    p = successes/n
+    denom = 1 + z**2/n
+    centre = (p + z**2/(2*n))/denom
+    half_width = z*np.sqrt(p*(1-p)/n + z**2/(4*n**2))/denom
+    return (float(centre-half_width),float(centre+half_width))
+
+
+# interval on calc_p_win_sans_draws: a win proportion among the non-draw games
+def win_sans_draws_interval(outcome_counts,z):
+
+    win, lose, draw, bust = outcome_counts
+    return wilson_interval(win,win+lose+bust,z)
+
+
+# simulate stay and hit games in batches until the recommendation is settled: stop once the
+# two intervals on calc_p_win_sans_draws no longer overlap, both are narrower than 
+# +/- precision, or max_samples games per choice have been played. yields the running 
+# estimate after every batch, so callers can show it converging
+def iter_hit_stay_probs_adaptive(hand,deck,n_drawn_by_house=2,batch_size=1000,
+                                 confidence=0.95,precision=0.01,max_samples=1e5,rng=None,
+                                 instrument=None):
+
+    rng = as_np_rng(rng)
+    hand = as_hand_state(hand)
+    deck = as_count_deck(deck)
+    max_samples = int(max_samples)
+    z = NormalDist().inv_cdf((1+confidence)/2)
+    hand_value = hand.get_hand_value()
+    hand_code = hand.hard_total + 64*hand.aces
+
+    stay_counts = np.zeros(len(outcome_keys),dtype=np.int64)
+    hit_counts = np.zeros(len(outcome_keys),dtype=np.int64)
+    n, resolved = 0, False
+    while n < max_samples:
+        size = min(batch_size,max_samples-n)
+        house_values = score_codes(sum(deal_card_codes(deck,n_drawn_by_house,size,rng)))
+        stay_counts += tally_outcomes(np.full(size,hand_value),house_values,hand.bust_threshold)
+
+        # hit card and house cards come from one deal so the house never sees the hit card
+        hit_codes = deal_card_codes(deck,1+n_drawn_by_house,size,rng)
+        hit_values = score_codes(hand_code + hit_codes[0],hand.bust_threshold)
+        house_values = score_codes(sum(hit_codes[1:]))
+        hit_counts += tally_outcomes(hit_values,house_values,hand.bust_threshold)
+        n += size
+        if instrument is not None:
+            instrument.count("deals",2*size)
+            instrument.chunk_done("iter_hit_stay_probs_adaptive",n,max_samples)
+
+        stay_interval = win_sans_draws_interval(stay_counts,z)
+        hit_interval = win_sans_draws_interval(hit_counts,z)
+        resolved = (stay_interval[0] > hit_interval[1]) or (hit_interval[0] > stay_interval[1])
+        widest = max(stay_interval[1]-stay_interval[0],hit_interval[1]-hit_interval[0])
+        yield {
+            "stay":dict(zip(outcome_keys,[float(k) for k in stay_counts/n])),
+            "hit":dict(zip(outcome_keys,[float(k) for k in hit_counts/n])),
+            "sampling":{
+                "stay_interval":stay_interval,
+                "hit_interval":hit_interval,
+                "confidence":confidence,
+                "samples":n,
+                "resolved":resolved
+                }
+            }
+        if resolved or widest/2 <= precision:
+            break
+
+
+# the last of iter_hit_stay_probs_adaptive's estimates
+def get_hit_stay_probs_adaptive(hand,deck,n_drawn_by_house=2,batch_size=1000,
+                                confidence=0.95,precision=0.01,max_samples=1e5,rng=None,
+                                instrument=None):
+
+    for hit_stay_d in iter_hit_stay_probs_adaptive(
+        hand,deck,n_drawn_by_house,batch_size,confidence,precision,max_samples,rng,instrument
+        ):
+        pass
+    return hit_stay_d
+
+
+# hit and stay simulated on common random numbers: both choices are scored against the 
+# very same house hands, so the noise in their difference (what get_recommendation acts 
+# on) largely cancels. Without stratify, each game deals the hit card then the house's 
+# cards from one deck, and the house's cards are still a fair draw for the stay branch. 
+# With stratify, every possible hit card gets its share of games (weighted by its 
+# probability) instead of being sampled. antithetic pairs each house deal with its mirror.
+def simulate_hit_stay_crn(hand,deck,n_drawn_by_house=2,niters=1e4,stratify=True,
+                          antithetic=True,rng=None):
+
+    rng = as_np_rng(rng)
+    hand = as_hand_state(hand)
+    deck = as_count_deck(deck)
+    niters = int(niters)
+    bust_threshold = hand.bust_threshold
+    hand_value = hand.get_hand_value()
+
+    stay_p = np.zeros(len(outcome_keys))
+    hit_p = np.zeros(len(outcome_keys))
+    if stratify:
+        for i in np.flatnonzero(deck.counts):
+            p_card = deck.counts[i]/deck.n
+            size = max(1,int(round(niters*p_card)))
+            deck_i = deck.copy()
+            deck_i.remove_rank(card_ranks[i])
+            house_values = score_codes(sum(
+                deal_card_codes(deck_i,n_drawn_by_house,size,rng,antithetic)
+                ))
+            hit_value = hand.copy().add_rank(i).get_hand_value()
+            stay_p += p_card*tally_outcomes(np.full(size,hand_value),house_values,bust_threshold)/size
+            hit_p += p_card*tally_outcomes(np.full(size,hit_value),house_values,bust_threshold)/size
+    else:
+        codes = deal_card_codes(deck,1+n_drawn_by_house,niters,rng,antithetic)
+        house_values = score_codes(sum(codes[1:]))
+        hit_values = score_codes(hand.hard_total + 64*hand.aces + codes[0],bust_threshold)
+        stay_p = tally_outcomes(np.full(niters,hand_value),house_values,bust_threshold)/niters
+        hit_p = tally_outcomes(hit_values,house_values,bust_threshold)/niters
+
+    return {
+        "stay":dict(zip(outcome_keys,[float(p) for p in stay_p])),
+        "hit":dict(zip(outcome_keys,[float(p) for p in hit_p]))
+        }
+
+
+# the methods that can value doubling down and splitting (exactly, with the policy solver)
+action_methods = ["exact","optimal"]
+
+
+# adds "double" and, for a pair, "split" to a get_hit_stay_probs result, next to "stay" 
+# and "hit". they carry an "ev" per unit of the original bet, since doubling and 
+# splitting put more than that at stake. stay and hit get an "ev" from the same solve,
+# so get_best_action weighs every action on one policy: split plays each hand on 
+# optimally, so hit's "ev" is hitting then playing on optimally too, even where its 
+# outcomes (method="exact") are for one card then standing
+def add_action_values(hit_stay_d,hand,deck,house_rule="two_cards"):
+
+    action_d = get_action_values(hand,deck,house_rule)
+    for action in ("stay","hit"):
+        if action in action_d:
+            hit_stay_d[action] = dict(hit_stay_d[action],ev=action_d[action]["ev"])
+    for action in ("double","split"):
+        if action in action_d:
+            hit_stay_d[action] = action_d[action]
+    return hit_stay_d
+
+
 # so, should you hit or stay?
-def get_hit_stay_probs(hand,deck):
-    stay_hand = deepcopy(hand)
-    stay_prob_d = compare_prob_hand_to_house(stay_hand,deck)
-    hit_base_hand = deepcopy(hand)
-    hit_prob_d = compare_prob_hit_to_house(hit_base_hand,deck)
+# method="exact" computes the odds from the remaining cards, "simulate" plays random games
+# one at a time and "vectorized" plays the house's games in numpy batches. "adaptive" 
+# simulates only until the answer is statistically clear (see get_hit_stay_probs_adaptive)
+# and "crn" runs both choices on shared, stratified house draws (see simulate_hit_stay_crn).
+# "optimal" is exact, but its hit odds assume you keep hitting while it pays to, and it 
+# adds the full policy (see solve_optimal_policy).
+# repeated states are answered from cache (pass cache=None to always recompute), for the
+# deterministic methods and for seeded runs of the others (see is_cacheable).
+# n_workers > 1 spreads the simulated hit branch over a process pool (or pass a long-lived
+# executor to use that instead). house_rule (see
+# house_rules) lets the dealer draw to 17, which only the exact method models. actions=True 
+# also values doubling down and splitting (see add_action_values), for the action_methods;
+# get_best_action then picks among all four
+def get_hit_stay_probs(hand,deck,method="exact",cache=hit_stay_cache,n_workers=1,seed=None,
+                       house_rule="two_cards",instrument=None,actions=False,executor=None):
+    if house_rule not in house_rules:
+        raise ValueError(f"unknown house_rule {house_rule}, use one of {house_rules}")
+    if house_rule != "two_cards" and method not in ("exact","optimal"):
+        raise ValueError("dealer draws are only modelled by method='exact' or 'optimal'")
+    if actions and method not in action_methods:
+        raise ValueError(f"doubling and splitting are only valued by the methods {action_methods}")
+    if cache is not None and not is_cacheable(method,seed):
+        cache = None
+    if cache is not None:
+        key = cache.make_key(hand,deck,method,house_rule,actions,seed)
+        cached = cache.get(key)
+        if instrument is not None:
+            instrument.count("cache_hits" if cached is not None else "cache_misses")
+        if cached is not None:
+            return cached
+    if instrument is not None:
+        start = perf_counter()
+
+    if method in ("adaptive","crn","optimal"):
+        if method == "adaptive":
+            hit_stay_d = get_hit_stay_probs_adaptive(hand,deck,rng=seed,instrument=instrument)
+        elif method == "optimal":
+            solved = solve_optimal_policy(hand,deck,house_rule)
+            hit_stay_d = {
+                "stay":solved["stay"],
+                "hit":solved["hit"],
+                "optimal":{k:solved[k] for k in ("action","ev","ev_stay","ev_hit","policy")}
+                }
+        else:
+            hit_stay_d = simulate_hit_stay_crn(hand,deck,rng=seed)
+        if actions:
+            add_action_values(hit_stay_d,hand,deck,house_rule)
+        if instrument is not None:
+            instrument.add_time("evaluate",start)
+        if cache is not None:
+            cache.put(key,hit_stay_d)
+        return hit_stay_d
+
+    if method == "exact":
+        stay_prob_d = exact_prob_hand_to_house(hand,deck,house_rule=house_rule)
+        hit_prob_d = exact_prob_hit_to_house(hand,deck,house_rule=house_rule)
+    elif method in ("simulate","vectorized"):
+        vectorized = (method == "vectorized")
+        rng = random.Random(seed) if seed is not None else random
+        stay_prob_d = compare_prob_hand_to_house(
+            hand,deck,rng=rng,vectorized=vectorized,instrument=instrument
+            )
+        if n_workers == 1 and seed is None and executor is None:
+            hit_prob_d = compare_prob_hit_to_house(
+                hand,deck,vectorized=vectorized,instrument=instrument
+                )
+        else:
+            hit_prob_d = compare_prob_hit_to_house_parallel(
+                hand,deck,n_workers=n_workers,seed=seed,vectorized=vectorized,instrument=instrument,
+                executor=executor
+                )
+    else:
+        raise ValueError(f"unknown method {method}, use 'exact', 'simulate', 'vectorized', 'adaptive', 'crn' or 'optimal'")
+
+    hit_stay_d = {"stay":stay_prob_d,"hit":hit_prob_d}
+    if actions:
+        add_action_values(hit_stay_d,hand,deck,house_rule)
+    if instrument is not None:
+        instrument.add_time("evaluate",start)
+    if cache is not None:
+        cache.put(key,hit_stay_d)
 
-    return {"stay":stay_prob_d,"hit":hit_prob_d}
+    return hit_stay_d
 
 
 def get_recommendation(hit_stay_d):
@@ -417,6 +1825,74 @@ def get_recommendation(hit_stay_d):
         return "immaterial"
 
 
+# precomputed odds for every two-card starting hand dealt from a full single deck, suits 
+# ignored. Rows are rank pairs (i <= j in card_ranks order) in a .npy file that is 
+# memory-mapped, so a lookup is an index calculation rather than a computation. 
+# Build the file with gen_strategy_table.py.
+default_strategy_table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),"strategy_table.npy")
+recommendation_keys = ["stay","hit","immaterial"]
+strategy_table_dtype = np.dtype([
+    ("stay","<f8",(len(outcome_keys),)),
+    ("hit","<f8",(len(outcome_keys),)),
+    ("recommendation","u1")
+    ])
+
+
+class StrategyTable:
+
+    def __init__(self,rows):
+        self.rows = rows
+
+
+    @classmethod
+    def load(cls,path=default_strategy_table_path):
+        return cls(np.load(path,mmap_mode="r"))
+
+
+    # row of the rank pair (i,j), i <= j, in a flattened upper triangle of card_ranks
+    @staticmethod
+    def row_index(rank1,rank2):
+
+        i, j = sorted((rank_index[str(rank1)],rank_index[str(rank2)]))
+        n = len(card_ranks)
+        return i*n - i*(i-1)//2 + (j-i)
+
+
+    def lookup_ranks(self,rank1,rank2):
+
+        row = self.rows[self.row_index(rank1,rank2)]
+        return {
+            "stay":dict(zip(outcome_keys,[float(p) for p in row["stay"]])),
+            "hit":dict(zip(outcome_keys,[float(p) for p in row["hit"]])),
+            }
+
+
+    def lookup_recommendation(self,rank1,rank2):
+        return recommendation_keys[int(self.rows[self.row_index(rank1,rank2)]["recommendation"])]
+
+
+    # get_hit_stay_probs for a two-card Hand dealt from an otherwise full single Deck,
+    # None for any other state so the caller can fall back to the live engine
+    def lookup(self,hand,deck):
+
+        if not isinstance(hand,Hand) or len(hand.hand) != 2:
+            return None
+        expected = np.full(len(card_ranks),len(card_suits))
+        for card in hand.hand:
+            expected[rank_index[card.rank]] -= 1
+        if not np.array_equal(as_count_deck(deck).counts,expected):
+            return None
+        return self.lookup_ranks(hand.hand[0].rank,hand.hand[1].rank)
+
+
+# None when the table hasn't been generated, so callers can fall back to live odds
+def load_strategy_table(path=default_strategy_table_path):
+
+    if not os.path.exists(path):
+        return None
+    return StrategyTable.load(path)
+
+
 def get_reco_text(hit_stay_d):
 
     stay_win_no_draws = calc_p_win_sans_draws(hit_stay_d["stay"])
@@ -435,16 +1911,33 @@ def get_reco_text(hit_stay_d):
     else:
         str_+="Follow your heart. The odds are the same either way."
 
+    # adaptive estimates also say how sure they are
+    if "sampling" in hit_stay_d:
+        sampling = hit_stay_d["sampling"]
+        hit_lo, hit_hi = [round(p*100,1) for p in sampling["hit_interval"]]
+        stay_lo, stay_hi = [round(p*100,1) for p in sampling["stay_interval"]]
+        str_+=f"\n({round(sampling['confidence']*100)}% intervals: hit {hit_lo}-{hit_hi}%, \
+stay {stay_lo}-{stay_hi}%, from {sampling['samples']} games per choice.)"
+
+    str_+=get_actions_text(hit_stay_d)
+
     return str_
 
 
+# when doubling and splitting were valued too: what each action returns and the best one
+def get_actions_text(hit_stay_d):
+
+    if "double" not in hit_stay_d and "split" not in hit_stay_d:
+        return ""
+    evs = ", ".join([
+        f"{action} {hit_stay_d[action].get('ev',calc_expected_value(hit_stay_d[action])):+.2f}"
+        for action in ("stay","hit","double","split") if action in hit_stay_d
+        ])
+    return f"\nExpected return per unit bet: {evs}. Best play: {get_best_action(hit_stay_d)}."
+
+
 def check_if_in_deck(rank,suit,deck):
-    for card in deck.cards:
-        rank_same = (rank == card.rank)
-        suit_same = (suit == card.suit)
-        if rank_same and suit_same:
-            return True
-    return False 
+    return Card(rank,suit) in deck
 
 
 # purpose: wrapper function to allow user to interact without specifying a suit 
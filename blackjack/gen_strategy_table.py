@@ -0,0 +1,42 @@
+# gen_strategy_table.py
+
+# generate the strategy table read by StrategyTable in blackjack.py:
+# the stay/hit odds and recommendation for every two-card starting hand 
+# dealt from a full single deck, suits ignored 
+
+import sys
+import numpy as np
+
+from blackjack import *
+
+
+def gen_strategy_table(path=default_strategy_table_path,method="exact"):
+
+    n = len(card_ranks)
+    rows = np.zeros(n*(n+1)//2,dtype=strategy_table_dtype)
+
+    for i in range(n):
+        for j in range(i,n):
+            rank1, rank2 = card_ranks[i], card_ranks[j]
+            deck = Deck()
+            # a pair needs two different suits of the same rank
+            hand = Hand(deck=deck,drawn_hand=[Card(rank1,card_suits[0]),Card(rank2,card_suits[1])])
+            hit_stay_d = get_hit_stay_probs(hand,deck,method=method,cache=None)
+
+            row = rows[StrategyTable.row_index(rank1,rank2)]
+            row["stay"] = [hit_stay_d["stay"][k] for k in outcome_keys]
+            row["hit"] = [hit_stay_d["hit"][k] for k in outcome_keys]
+            row["recommendation"] = recommendation_keys.index(get_recommendation(hit_stay_d))
+
+    np.save(path,rows)
+    print(f"{len(rows)} starting hands written to {path}")
+
+    return rows
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1:
+        gen_strategy_table(sys.argv[1])
+    else:
+        gen_strategy_table()
@@ -2,8 +2,11 @@
 # gui.py
 
 from blackjack import *
+import queue
+import threading
 import tkinter as tk
 from tkinter import font as tkfont
+from tkinter import ttk
 
 
 def reset_deck():
@@ -16,6 +19,19 @@ def hand_contains():
     return Interpreter(hand)
 
 
+# starting hands are answered from the precomputed table when it has been generated
+strategy_table = load_strategy_table()
+
+# off-table hands are worked out on a background thread: it streams sampled estimates 
+# from batches of this size, then finishes with the exact odds
+estimate_batch_size = 1000
+estimate_max_samples = 20000
+poll_ms = 50
+
+# the engine's caches are shared, so a superseded worker finishes its step before the next starts
+engine_lock = threading.Lock()
+
+
 class App(tk.Tk):
 
     def __init__(self, *args, **kwargs):
@@ -84,12 +100,13 @@ class ExplainSelfPage(tk.Frame):
 
         tk.Frame.__init__(self, parent)
         self.controller = controller
-        str_="""I'm a simulator! 👾 
+        str_="""I'm a calculator! 👾 
         
-        Starting from your drawn hand, I play twenty thousand
-          games and average the results. From here, I can tell 
-        you the odds and what I think you should do if you 
-        want to optimize your chances of winning 🔮"""
+        Starting from your drawn hand, I work out the exact odds
+          of every card you and the House could still draw. 
+        From here, I can tell you the odds and what I think 
+        you should do if you want to optimize your chances 
+        of winning 🔮"""
         label = tk.Label(self, text=str_)
         label.pack(side="top", fill="x", pady=10)
         button = tk.Button(self, text="Back",
@@ -248,8 +265,6 @@ class GamePage(tk.Frame):
         str_=f"""You hold {hand_contains()}.
         The House draws two cards, which you cannot see.
         Do you think you should hit or stay?
-        (After guessing below, please allow 20 seconds 
-        for the computer to play 20,000 games.)
         """
         label = tk.Label(self, text=str_)
         label.pack(side="top", fill="x", pady=10)
@@ -286,6 +301,11 @@ class ResultsPage(tk.Frame):
         
         tk.Frame.__init__(self, parent)
         self.controller = controller 
+        # each select starts a new generation; results from older ones are dropped
+        self.generation = 0
+        self.cancelled = threading.Event()
+        self.running = False
+        self.results = queue.Queue()
 
 
     @ staticmethod
@@ -316,25 +336,135 @@ class ResultsPage(tk.Frame):
         else:
             str_+="you should follow your heart.\nThe odds are the same either way."
 
+        # doubling down and splitting, once the exact odds are in
+        str_+=get_actions_text(hit_stay_d)
+
         return str_
 
 
     def select(self): 
 
+        self.cancel()
+        self.generation += 1
+        self.cancelled = threading.Event()
+
         for widget in self.winfo_children():
             widget.destroy()
 
-        label = tk.Label(self, text="""Testing your cards with 10,000 draws...
-        Give me about 15 seconds!""")
-        label.pack(side="top", fill="x", pady=10)
+        self.label = tk.Label(self, text="Working out the odds for your cards...")
+        self.label.pack(side="top", fill="x", pady=10)
+
+        self.progress = ttk.Progressbar(self, mode="determinate", 
+                                        maximum=estimate_max_samples, length=300)
+        self.progress.pack(pady=5)
+        self.cancel_button = tk.Button(self, text="Cancel", command=self.cancel)
+        self.cancel_button.pack()
 
         restart = tk.Button(self, text="Restart",
-                                command=lambda: self.controller.show_frame("ChoiceOrRandomPage"))
+                                command=lambda: [
+                                    self.cancel(),
+                                    self.controller.show_frame("ChoiceOrRandomPage")
+                                    ])
         restart.pack()
 
-        hit_stay_d = get_hit_stay_probs(hand,deck)
+        hit_stay_d = None
+        if strategy_table is not None:
+            hit_stay_d = strategy_table.lookup(hand,deck)
+        if hit_stay_d is not None: 
+            # the solver's states are small for a starting hand, so this is quick
+            add_action_values(hit_stay_d,hand,deck)
+            self.show_result(hit_stay_d)
+            return
+
+        # off-table hand, work it out live on snapshots so a new deal can't change them 
+        worker = threading.Thread(
+            target=self.work, 
+            args=(self.generation,self.cancelled,hand.to_state(),deck.to_count_deck()),
+            daemon=True
+            )
+        self.running = True
+        self.estimate_text = f"You hold {hand_contains()}."
+        worker.start()
+        self.after(poll_ms, self.poll, self.generation)
+
+
+    # runs on the worker thread; only talks to the page through the queue
+    def work(self, generation, cancelled, hand_state, count_deck):
+
+        try:
+            with engine_lock:
+                for hit_stay_d in iter_hit_stay_probs_adaptive(
+                    hand_state,count_deck,batch_size=estimate_batch_size,
+                    max_samples=estimate_max_samples
+                    ):
+                    if cancelled.is_set():
+                        return
+                    self.results.put((generation,"estimate",hit_stay_d))
+            with engine_lock:
+                if cancelled.is_set():
+                    return
+                hit_stay_d = get_hit_stay_probs(hand_state,count_deck,actions=True)
+            self.results.put((generation,"exact",hit_stay_d))
+        except Exception as e:
+            self.results.put((generation,"error",e))
+
+
+    # runs on the Tk thread: drain the queue, then check back until this run is done
+    def poll(self, generation):
+
+        if generation != self.generation or self.cancelled.is_set():
+            return
+        while True:
+            try:
+                message_generation, kind, payload = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if message_generation != self.generation: # stale run
+                continue
+            if kind == "estimate":
+                self.show_estimate(payload)
+            elif kind == "exact":
+                self.show_result(payload)
+                return
+            else:
+                self.finish(f"Something went wrong working out the odds:\n{payload}")
+                return
+        self.after(poll_ms, self.poll, generation)
+
+
+    def show_estimate(self, hit_stay_d):
+
+        samples = hit_stay_d["sampling"]["samples"]
+        self.progress.configure(value=samples)
+        str_ = self.get_reco_text(hit_stay_d)
+        self.estimate_text = f"You hold {hand_contains()}.\n{str_}\n\
+(Estimated from {samples} simulated games.)"
+        self.label.configure(text=f"You hold {hand_contains()}.\n{str_}\n\
+(Estimated from {samples} simulated games so far, working out the exact odds...)")
+
+
+    def show_result(self, hit_stay_d):
+
         str_ = self.get_reco_text(hit_stay_d) 
-        label.configure(text=f"You hold {hand_contains()}.\n{str_}")
+        self.finish(f"You hold {hand_contains()}.\n{str_}")
+
+
+    def finish(self, str_):
+
+        self.running = False
+        self.label.configure(text=str_)
+        self.progress.configure(value=estimate_max_samples)
+        self.cancel_button.configure(state="disabled")
+
+
+    def cancel(self):
+
+        if not self.running:
+            return
+        self.running = False
+        self.cancelled.set()
+        self.label.configure(text=f"{self.estimate_text}\nCancelled before the exact odds were worked out.")
+        self.cancel_button.configure(state="disabled")
 
 
 
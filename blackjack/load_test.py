@@ -0,0 +1,180 @@
+# load_test.py
+
+# drives a recommendation server (server.py) at a fixed request rate and reports the
+# latency percentiles. requests go out on schedule whether or not earlier ones have
+# been answered, and each latency is timed from its scheduled start, so a server that
+# falls behind shows up in the tail instead of slowing the test down
+#
+#   python load_test.py --start-server --rps 300 --duration 10
+#   python load_test.py --port 8080 --rps 500 --states 50
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+
+# a mix of hands and dealt cards; the first states are asked for most often, so the
+# run sees repeated and concurrent requests for the same state as well as new ones
+def make_payloads(n_states,method="exact",seed=0):
+
+    rng = random.Random(seed)
+    ranks = ["2","3","4","5","6","7","8","9","10","J","Q","K","A"]
+    payloads = list()
+    for _ in range(n_states):
+        deck = [rank for rank in ranks for _ in range(4)]
+        rng.shuffle(deck)
+        n_dealt = rng.randrange(0,16)
+        payloads.append(json.dumps({
+            "hand":deck[:2],
+            "dealt":deck[2:2+n_dealt],
+            "method":method
+            }).encode())
+    weights = [1/(i+1) for i in range(n_states)]
+    return payloads, weights
+
+
+async def post(host,port,body,timeout):
+
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host,port),timeout)
+    try:
+        writer.write(
+            b"POST /recommend HTTP/1.1\r\nHost: " + host.encode() +
+            b"\r\nContent-Type: application/json\r\nConnection: close\r\nContent-Length: " +
+            str(len(body)).encode() + b"\r\n\r\n" + body
+            )
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(),timeout)
+    finally:
+        writer.close()
+    return int(response.split(b" ",2)[1])
+
+
+async def get_json(host,port,path,timeout=5):
+
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host,port),timeout)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(),timeout)
+    finally:
+        writer.close()
+    return json.loads(response.split(b"\r\n\r\n",1)[1])
+
+
+async def timed_request(host,port,body,scheduled,timeout,results):
+
+    try:
+        status = await post(host,port,body,timeout)
+    except (OSError,asyncio.TimeoutError,IndexError,ValueError) as e:
+        status = type(e).__name__
+    results.append((time.perf_counter() - scheduled,status))
+
+
+async def run_load(host,port,rps,duration,payloads,weights,timeout=10,seed=0):
+
+    rng = random.Random(seed)
+    n_requests = int(rps*duration)
+    results = list()
+    tasks = list()
+    start = time.perf_counter()
+    for i in range(n_requests):
+        scheduled = start + i/rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        body = rng.choices(payloads,weights)[0]
+        tasks.append(asyncio.create_task(timed_request(host,port,body,scheduled,timeout,results)))
+    await asyncio.gather(*tasks)
+    return results, time.perf_counter() - start
+
+
+# nearest-rank percentile of a sorted list
+def percentile(sorted_values,q):
+
+    if not sorted_values:
+        return float("nan")
+    i = min(len(sorted_values)-1,max(0,int(round(q/100*len(sorted_values)+0.5))-1))
+    return sorted_values[i]
+
+
+def report(results,elapsed,rps,server_stats=None):
+
+    latencies = sorted(latency for latency,status in results if status == 200)
+    errors = dict()
+    for _,status in results:
+        if status != 200:
+            errors[status] = errors.get(status,0) + 1
+    print(f"requests    {len(results)} at a target of {rps:g}/s, {len(results)/elapsed:.1f}/s achieved")
+    print(f"ok          {len(latencies)}")
+    if errors:
+        print(f"errors      {errors}")
+    for q in (50,90,99):
+        print(f"p{q:<10} {percentile(latencies,q)*1000:.1f} ms")
+    if latencies:
+        print(f"max         {latencies[-1]*1000:.1f} ms")
+    if server_stats is not None:
+        print(f"server      computed {server_stats['computed']}, coalesced {server_stats['coalesced']}, \
+cache hits {server_stats['cache_hits']}")
+
+
+def free_port():
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1",0))
+        return s.getsockname()[1]
+
+
+# a local server.py on its own port, waited on until it answers
+def start_server(port,n_workers=None):
+
+    cmd = [sys.executable,os.path.join(os.path.dirname(os.path.abspath(__file__)),"server.py"),
+           "--port",str(port)]
+    if n_workers is not None:
+        cmd += ["--workers",str(n_workers)]
+    process = subprocess.Popen(cmd,stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            asyncio.run(get_json("127.0.0.1",port,"/health",timeout=1))
+            return process
+        except (OSError,asyncio.TimeoutError,ValueError):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Load test a blackjack recommendation server.")
+    parser.add_argument("--host",default="127.0.0.1")
+    parser.add_argument("--port",type=int,default=8080)
+    parser.add_argument("--rps",type=float,default=300,help="requests per second to send")
+    parser.add_argument("--duration",type=float,default=10,help="seconds to send for")
+    parser.add_argument("--states",type=int,default=200,help="distinct game states to ask about")
+    parser.add_argument("--method",default="exact",help="get_hit_stay_probs method to request")
+    parser.add_argument("--seed",type=int,default=0)
+    parser.add_argument("--start-server",action="store_true",help="start a local server.py on a free port")
+    parser.add_argument("--workers",type=int,default=None,help="worker processes for --start-server")
+    args = parser.parse_args()
+
+    process = None
+    if args.start_server:
+        args.host, args.port = "127.0.0.1", free_port()
+        process = start_server(args.port,args.workers)
+    try:
+        payloads, weights = make_payloads(args.states,args.method,args.seed)
+        results, elapsed = asyncio.run(
+            run_load(args.host,args.port,args.rps,args.duration,payloads,weights,seed=args.seed)
+            )
+        server_stats = asyncio.run(get_json(args.host,args.port,"/stats"))
+        report(results,elapsed,args.rps,server_stats)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
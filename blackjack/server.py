@@ -0,0 +1,304 @@
+# server.py
+
+# HTTP service for the blackjack engine: the odds and recommendation for a hand, given
+# the cards already out of the deck
+#
+#   python server.py --port 8080
+#
+#   GET  /recommend?hand=10,6&dealt=5,K&method=exact
+#   POST /recommend   {"hand":["10","6"],"dealt":["5","K"],"n_decks":1,
+#                      "method":"exact","house_rule":"two_cards","actions":true}
+#   GET  /stats       cache and request counters
+#   GET  /health
+#
+# the engine runs in a process pool so the event loop only ever parses and answers
+# requests. results of the deterministic methods are cached across requests on the same 
+# key the engine's own cache uses (value counts left, hand value, soft); sampled ones are
+# fresh estimates every time. concurrent requests for a state that
+# is already being worked out wait on that one computation instead of starting another.
+# the exact and optimal methods also value doubling down and splitting unless asked not to
+# ("actions": false), and best_action picks among every action valued
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from blackjack import *
+
+
+max_body_bytes = 64*1024
+max_cards = 52*8
+methods = ["exact","simulate","vectorized","adaptive","crn","optimal"]
+statuses = {200:"OK",400:"Bad Request",404:"Not Found",405:"Method Not Allowed",
+            413:"Payload Too Large",500:"Internal Server Error"}
+
+
+class RequestError(ValueError):
+    pass
+
+
+def make_state(hand_ranks,dealt_ranks=(),n_decks=1):
+
+    if len(hand_ranks) + len(dealt_ranks) > max_cards:
+        raise RequestError("too many cards")
+    try:
+        return state_from_ranks(hand_ranks,dealt_ranks,n_decks)
+    except ValueError as e: # unknown rank, or more of a rank than the shoe holds
+        raise RequestError(str(e))
+
+
+# runs in a worker process. the server keeps the shared cache, so none is used here
+def evaluate_state(hard_total,aces,pair_rank,counts,n_decks,method,house_rule,actions):
+
+    deck = CountDeck(counts,n_decks)
+    return get_hit_stay_probs(HandState(hard_total,aces,pair_rank),deck,method=method,cache=None,
+                              house_rule=house_rule,actions=actions)
+
+
+# the optimal policy is keyed on tuples of drawn cards, which JSON can't hold
+def to_json_safe(hit_stay_d):
+
+    safe = dict(hit_stay_d)
+    if "optimal" in safe:
+        optimal = dict(safe["optimal"])
+        optimal["policy"] = {"+".join(drawn):action for drawn,action in optimal["policy"].items()}
+        safe["optimal"] = optimal
+    return safe
+
+
+class RecommendationService:
+
+    def __init__(self,pool,cache=None):
+
+        self.pool = pool
+        self.cache = cache if cache is not None else RecommendationCache()
+        # cache key -> future of the computation under way for it
+        self.in_flight = dict()
+        self.counters = {"requests":0,"computed":0,"coalesced":0,"cache_hits":0,"errors":0}
+
+
+    async def get_hit_stay_probs(self,hand,deck,method="exact",house_rule="two_cards",actions=False):
+
+        key = self.cache.make_key(hand,deck,method,house_rule,actions)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.counters["cache_hits"] += 1
+            return cached
+
+        future = self.in_flight.get(key)
+        if future is None:
+            self.counters["computed"] += 1
+            future = asyncio.get_running_loop().run_in_executor(
+                self.pool,evaluate_state,hand.hard_total,hand.aces,hand.pair_rank,
+                tuple(int(n) for n in deck.counts),deck.n_decks,method,house_rule,actions
+                )
+            self.in_flight[key] = future
+            future.add_done_callback(partial(self.finish,key,is_cacheable(method)))
+        else:
+            self.counters["coalesced"] += 1
+        # shielded so a client hanging up doesn't cancel the others' computation
+        return await asyncio.shield(future)
+
+
+    def finish(self,key,cacheable,future):
+
+        self.in_flight.pop(key,None)
+        if cacheable and not future.cancelled() and future.exception() is None:
+            self.cache.put(key,future.result())
+
+
+    async def recommend(self,params):
+
+        hand_ranks = params.get("hand") or []
+        dealt_ranks = params.get("dealt") or []
+        method = params.get("method","exact")
+        house_rule = params.get("house_rule","two_cards")
+        if method not in methods:
+            raise RequestError(f"unknown method {method}, use one of {methods}")
+        if house_rule not in house_rules:
+            raise RequestError(f"unknown house_rule {house_rule}, use one of {house_rules}")
+        actions = params.get("actions",method in action_methods)
+        if isinstance(actions,str): # from a query string
+            actions = actions.lower() not in ("0","false","no")
+        if not isinstance(actions,bool):
+            raise RequestError("actions must be true or false")
+        if actions and method not in action_methods:
+            raise RequestError(f"actions are only valued by the methods {action_methods}")
+        try:
+            n_decks = int(params.get("n_decks",1))
+        except (TypeError,ValueError):
+            raise RequestError("n_decks must be a whole number")
+        if not 1 <= n_decks <= 8:
+            raise RequestError("n_decks must be between 1 and 8")
+
+        hand, deck = make_state(hand_ranks,dealt_ranks,n_decks)
+        if len(deck) < 3:
+            raise RequestError("not enough cards left to play")
+        try:
+            hit_stay_d = await self.get_hit_stay_probs(hand,deck,method,house_rule,actions)
+        except ValueError as e: # a house rule the method doesn't model
+            raise RequestError(str(e))
+
+        return {
+            "hand_value":hand.get_hand_value(),
+            "soft":hand.is_soft(),
+            "cards_left":len(deck),
+            "method":method,
+            "house_rule":house_rule,
+            **to_json_safe(hit_stay_d),
+            "recommendation":get_recommendation(hit_stay_d),
+            "best_action":get_best_action(hit_stay_d),
+            "text":get_reco_text(hit_stay_d)
+            }
+
+
+    def stats(self):
+        return {**self.counters,"in_flight":len(self.in_flight),"cache":self.cache.stats()}
+
+
+# query strings carry comma-separated ranks; JSON bodies carry lists
+def parse_params(method,target,body):
+
+    url = urlsplit(target)
+    if method == "GET":
+        params = {k:v[-1] for k,v in parse_qs(url.query).items()}
+        for k in ("hand","dealt"):
+            if k in params:
+                params[k] = [rank for rank in params[k].split(",") if rank]
+        return url.path, params
+    try:
+        params = json.loads(body or b"{}")
+    except ValueError:
+        raise RequestError("body is not valid JSON")
+    if not isinstance(params,dict):
+        raise RequestError("body must be a JSON object")
+    for k in ("hand","dealt"):
+        if k in params and not isinstance(params[k],list):
+            raise RequestError(f"{k} must be a list of ranks")
+    return url.path, params
+
+
+async def read_request(reader):
+
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise RequestError("malformed request line")
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n",b"\n",b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length",0) or 0)
+    except ValueError:
+        raise RequestError("malformed content-length")
+    if length > max_body_bytes:
+        raise RequestError("body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, version, headers, body
+
+
+def write_response(writer,status,payload,keep_alive):
+
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {statuses[status]}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+    writer.write(head.encode() + body)
+
+
+async def respond(service,method,target,body):
+
+    if method not in ("GET","POST"):
+        return 405, {"error":f"method {method} not allowed"}
+    path, params = parse_params(method,target,body)
+    if path == "/recommend":
+        service.counters["requests"] += 1
+        return 200, await service.recommend(params)
+    if path == "/stats":
+        return 200, service.stats()
+    if path == "/health":
+        return 200, {"ok":True}
+    return 404, {"error":f"no route {path}"}
+
+
+async def handle_connection(service,reader,writer):
+
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection","").lower() != "close")
+                status, payload = await respond(service,method,target,body)
+            except RequestError as e:
+                service.counters["errors"] += 1
+                status, payload = (413 if "too large" in str(e) else 400), {"error":str(e)}
+            except (asyncio.IncompleteReadError,ConnectionError):
+                break
+            except Exception as e:
+                service.counters["errors"] += 1
+                status, payload = 500, {"error":repr(e)}
+            write_response(writer,status,payload,keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1",port=8080,n_workers=None,cache_size=4096,cache_path=None):
+
+    cache = RecommendationCache(maxsize=cache_size,path=cache_path)
+    n_workers = n_workers or os.cpu_count() or 1
+    # spawned rather than forked: a worker forked mid-request would inherit that client's 
+    # socket and hold it open after the server is done with it
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_workers,mp_context=context) as pool:
+        # start the workers before the first request rather than during it
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(pool,os.getpid) for _ in range(n_workers)])
+        service = RecommendationService(pool,cache)
+        server = await asyncio.start_server(partial(handle_connection,service),host,port)
+        # stop cleanly on ctrl-c or kill, so the pool's workers exit and the cache is saved
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT,signal.SIGTERM):
+            loop.add_signal_handler(sig,stop.set)
+        print(f"serving on http://{host}:{port}",flush=True)
+        async with server:
+            await stop.wait()
+        if cache_path is not None:
+            cache.save()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Serve blackjack recommendations over HTTP.")
+    parser.add_argument("--host",default="127.0.0.1")
+    parser.add_argument("--port",type=int,default=8080)
+    parser.add_argument("--workers",type=int,default=None,help="engine processes (default: one per CPU)")
+    parser.add_argument("--cache-size",type=int,default=4096,help="results kept in memory")
+    parser.add_argument("--cache-path",default=None,help="file to load the cache from and save it to on exit")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host,args.port,args.workers,args.cache_size,args.cache_path))
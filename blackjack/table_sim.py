@@ -0,0 +1,281 @@
+# table_sim.py
+
+# plays round after round at a table, dealing from a shoe that is reshuffled once the cut
+# card comes out, and keeps fixed-size running statistics: outcome counts, histograms of
+# the final player and house totals, and the running mean and variance of the player's
+# result per round (Welford's method). memory doesn't grow with the number of rounds, and
+# long runs checkpoint to disk and can pick up where they stopped
+#
+#   python table_sim.py --rounds 1e7 --decks 6 --house-rule stand_soft_17 --checkpoint sim.pkl
+#   python table_sim.py --checkpoint sim.pkl --resume                finish the 1e7 rounds
+#   python table_sim.py --rounds 1e6 --checkpoint sim.pkl --extend   then play 1e6 more
+
+import argparse
+import math
+import os
+import pickle
+import random
+import time
+
+from blackjack import *
+
+
+policies = ["stand_on","exact"]
+payoffs = {"win":1.,"lose":-1.,"draw":0.,"bust":-1.}
+hard_values = rank_hard_values.tolist() # plain ints are quicker in the round loop
+ace = rank_index["A"]
+
+
+# running mean and variance of a stream of numbers in constant memory (Welford)
+class RunningStats:
+
+    def __init__(self):
+
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+
+    def update(self,x):
+
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta/self.n
+        self.m2 += delta*(x - self.mean)
+
+
+    # combines two streams' statistics (Chan et al.), e.g. from separate runs
+    def merge(self,other):
+
+        n = self.n + other.n
+        if n == 0:
+            return self
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta*delta*self.n*other.n/n
+        self.mean += delta*other.n/n
+        self.n = n
+        return self
+
+
+    def variance(self):
+        return self.m2/(self.n-1) if self.n > 1 else 0.
+
+
+    def stderr(self):
+        return math.sqrt(self.variance()/self.n) if self.n > 0 else 0.
+
+
+class TableSimulator:
+
+    # policy decides each hit: "stand_on" hits until the hand is worth at least stand_on,
+    # "exact" asks get_hit_stay_probs about the cards still unseen (much slower), and stands
+    # once too few are left to work the odds out from
+    def __init__(self,n_decks=1,penetration=0.75,house_rule="two_cards",policy="stand_on",
+                 stand_on=17,seed=None):
+
+        if house_rule not in house_rules:
+            raise ValueError(f"unknown house_rule {house_rule}, use one of {house_rules}")
+        if policy not in policies:
+            raise ValueError(f"unknown policy {policy}, use one of {policies}")
+        if not 0 < penetration < 1:
+            raise ValueError("penetration must be between 0 and 1")
+        self.n_decks = n_decks
+        self.penetration = penetration
+        self.house_rule = house_rule
+        self.policy = policy
+        self.stand_on = stand_on
+        self.rng = random.Random(seed)
+
+        # the shoe holds rank indices; dealing moves a position along it
+        self.shoe = [i for i in range(len(card_ranks)) for _ in range(len(card_suits)*n_decks)]
+        self.cut = int(penetration*len(self.shoe))
+        self.position = len(self.shoe) # so the first round shuffles
+
+        self.rounds = 0
+        self.target_rounds = 0 # where the current run stops, kept so a resumed run stops there too
+        self.shuffles = 0
+        # fixed-length tallies, kept as lists since they're bumped once per round
+        self.outcome_counts = [0]*len(outcome_keys)
+        self.player_totals = [0]*n_totals
+        self.house_totals = [0]*n_totals
+        self.result_stats = RunningStats()
+        self.seconds = 0.
+
+
+    def shuffle(self):
+
+        self.rng.shuffle(self.shoe)
+        self.position = 0
+        self.shuffles += 1
+
+
+    def draw(self):
+
+        # a round that runs past the end of the shoe carries on from a fresh one
+        if self.position == len(self.shoe):
+            self.shuffle()
+        rank_i = self.shoe[self.position]
+        self.position += 1
+        return rank_i
+
+
+    def wants_hit(self,hard_total,aces,value):
+
+        if self.policy == "stand_on":
+            return value < self.stand_on
+        unseen = np.bincount(self.shoe[self.position:],minlength=len(card_ranks))
+        if unseen.sum() < 3: # a hit and the house's two cards
+            return False
+        hit_stay_d = get_hit_stay_probs(HandState(hard_total,aces),CountDeck(unseen,self.n_decks),
+                                        house_rule=self.house_rule)
+        try:
+            return get_recommendation(hit_stay_d) == "hit"
+        except ZeroDivisionError: # so few cards left that a choice can only end in a draw
+            return False
+
+
+    def play_round(self):
+
+        if self.position >= self.cut:
+            self.shuffle()
+
+        hard_total, aces = 0, 0
+        for _ in range(2):
+            rank_i = self.draw()
+            hard_total += hard_values[rank_i]
+            aces += (rank_i == ace)
+        value = score_hard_total(hard_total,aces)
+        while value < 21 and self.wants_hit(hard_total,aces,value):
+            rank_i = self.draw()
+            hard_total += hard_values[rank_i]
+            aces += (rank_i == ace)
+            value = score_hard_total(hard_total,aces)
+
+        house_hard_total, house_aces, n_cards = 0, 0, 0
+        if value <= 21: # the house doesn't need to play against a bust hand
+            while True:
+                rank_i = self.draw()
+                house_hard_total += hard_values[rank_i]
+                house_aces += (rank_i == ace)
+                n_cards += 1
+                if n_cards < 2:
+                    continue
+                house_value = score_hard_total(house_hard_total,house_aces)
+                if self.house_rule == "two_cards" or house_value > 21:
+                    break
+                soft = house_aces > 0 and house_value != house_hard_total
+                if dealer_stands(house_value,soft,self.house_rule):
+                    break
+            self.house_totals[house_value] += 1
+
+        if value > 21:
+            outcome = "bust"
+        elif house_value > 21 or value > house_value:
+            outcome = "win"
+        elif value < house_value:
+            outcome = "lose"
+        else:
+            outcome = "draw"
+        return value, outcome
+
+
+    # plays n_rounds more rounds, saving a checkpoint every checkpoint_every rounds
+    def run(self,n_rounds,checkpoint_path=None,checkpoint_every=10**6,verbose=False):
+
+        self.target_rounds = self.rounds + int(n_rounds)
+        return self.finish(checkpoint_path,checkpoint_every,verbose)
+
+
+    # plays on until the current run's target, e.g. after loading a checkpoint
+    def finish(self,checkpoint_path=None,checkpoint_every=10**6,verbose=False):
+
+        outcome_i = {k:i for i,k in enumerate(outcome_keys)}
+        while self.rounds < self.target_rounds:
+            start = time.perf_counter()
+            stop = min(self.target_rounds,self.rounds + int(checkpoint_every))
+            try:
+                while self.rounds < stop:
+                    value, outcome = self.play_round()
+                    self.player_totals[value] += 1
+                    self.outcome_counts[outcome_i[outcome]] += 1
+                    self.result_stats.update(payoffs[outcome])
+                    self.rounds += 1 # kept with the tallies, so they agree even if a round fails
+            finally:
+                self.seconds += time.perf_counter() - start
+            if checkpoint_path is not None:
+                self.save(checkpoint_path)
+            if verbose:
+                summary = self.summary()
+                print(f"{self.rounds:>12,} rounds  house edge {summary['house_edge']*100:+.3f}% \
++/- {summary['house_edge_stderr']*100:.3f}%  {summary['rounds_per_sec']:,.0f} rounds/s")
+        return self
+
+
+    def summary(self):
+
+        return {
+            "rounds":self.rounds,
+            "shuffles":self.shuffles,
+            "outcomes":{k:n/max(self.rounds,1) for k,n in zip(outcome_keys,self.outcome_counts)},
+            "mean_result":self.result_stats.mean,
+            "result_stdev":math.sqrt(self.result_stats.variance()),
+            "house_edge":-self.result_stats.mean,
+            "house_edge_stderr":self.result_stats.stderr(),
+            "player_totals":list(self.player_totals),
+            "house_totals":list(self.house_totals),
+            "rounds_per_sec":self.rounds/self.seconds if self.seconds else 0.
+            }
+
+
+    # the whole simulator, shoe position and generator state included, so a resumed run
+    # deals exactly the cards an uninterrupted one would have. written to a temporary
+    # file first so a crash never leaves a half-written checkpoint
+    def save(self,path):
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path,"wb") as f:
+            pickle.dump(self,f)
+        os.replace(tmp_path,path)
+
+
+    @classmethod
+    def load(cls,path):
+
+        with open(path,"rb") as f:
+            return pickle.load(f)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Simulate rounds of blackjack from a shoe.")
+    parser.add_argument("--rounds",type=float,default=1e6,help="rounds to play (more, if extending)")
+    parser.add_argument("--decks",type=int,default=1)
+    parser.add_argument("--penetration",type=float,default=0.75,help="share of the shoe dealt before reshuffling")
+    parser.add_argument("--house-rule",default="two_cards",choices=house_rules)
+    parser.add_argument("--policy",default="stand_on",choices=policies)
+    parser.add_argument("--stand-on",type=int,default=17,help="total the stand_on policy stops hitting at")
+    parser.add_argument("--seed",type=int,default=None)
+    parser.add_argument("--checkpoint",default=None,help="file to checkpoint to")
+    parser.add_argument("--checkpoint-every",type=float,default=1e6,help="rounds between checkpoints")
+    parser.add_argument("--resume",action="store_true",help="finish the checkpointed run")
+    parser.add_argument("--extend",action="store_true",help="play --rounds more on top of the checkpoint")
+    args = parser.parse_args()
+
+    if args.resume and args.extend:
+        parser.error("use one of --resume and --extend")
+    if args.resume or args.extend:
+        if args.checkpoint is None or not os.path.exists(args.checkpoint):
+            parser.error("--resume and --extend need an existing --checkpoint file")
+        sim = TableSimulator.load(args.checkpoint)
+    else:
+        sim = TableSimulator(args.decks,args.penetration,args.house_rule,args.policy,
+                             args.stand_on,args.seed)
+    if args.resume:
+        print(f"resuming after {sim.rounds:,} of {sim.target_rounds:,} rounds")
+        sim.finish(args.checkpoint,args.checkpoint_every,verbose=True)
+    else:
+        if args.extend:
+            print(f"extending after {sim.rounds:,} rounds")
+        sim.run(args.rounds,args.checkpoint,args.checkpoint_every,verbose=True)
+    summary = sim.summary()
+    print("outcomes:",{k:round(p,4) for k,p in summary["outcomes"].items()})
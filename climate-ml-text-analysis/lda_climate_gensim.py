@@ -9,14 +9,16 @@ import re
 import json
 import requests  
 import random 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from math import log10, floor
 from glob import glob
+import numpy as np
 import pandas as pd
 
 from nltk import download as nltk_dl
 from nltk.corpus import stopwords
-from nltk.tokenize import RegexpTokenizer
 from nltk.stem.snowball import SnowballStemmer
 from nltk.stem.wordnet import WordNetLemmatizer
 
@@ -35,59 +37,160 @@ def round_to_n(x, n):
     return round(x, -int(floor(log10(x))) + (n - 1))
 
 
-def subset_and_preprocess_tweets(
+# nltk stopwords, stemmer and lemmatizer, loaded once per process (so once per
+# worker when files are processed in a pool) rather than on every call
+nltk_state = {}
+
+def get_nltk_state():
+    if not nltk_state:
+        try:
+            en_stop_words = stopwords.words("english")
+        except LookupError:
+            nltk_dl("stopwords")
+            en_stop_words = stopwords.words("english")
+
+        lemmatizer = WordNetLemmatizer()
+        try:
+            lemmatizer.lemmatize("tweets") # wordnet only loads on first use
+        except LookupError:
+            nltk_dl("wordnet")
+
+        nltk_state.update(
+            en_stop_words = en_stop_words,
+            stemmer = SnowballStemmer("english"),
+            lemmatizer = lemmatizer)
+    return nltk_state
+
+
+class TweetNormalizer:
+    """Compiled, reusable preprocessing of Tweet text. Lowercases, strips punctuation, keeps only \
+Tweets matching the keywords, drops stopwords and urls, and tokenizes and lemmatizes or stems, all \
+in one pass over each Tweet.
+
+    Gives the same text and tokens as running the steps one after another over the whole column. \
+Each distinct word is tokenized and lemmatized once and remembered, since the same words come up \
+over and over.
+    """
+
+    max_cached_words = 500000
+
+    def __init__(self, keyword_exp = None, custom_stop = None, stem_or_lem = "lem",
+        drop_mentions = False):
+
+        if stem_or_lem not in ("lem", "stem"):
+            raise ValueError(f"{stem_or_lem} is not a valid selection for stem_or_lem. use lem or stem.")
+        state = get_nltk_state()
+
+        self.stop_words = set(state["en_stop_words"]).union(custom_stop or [])
+        self.punct_re = re.compile(r'[^\w\s]+')
+        # Tweets are lowercase by the time they're searched, so lowercasing the keywords (but not
+        # escapes like \b) finds the same Tweets as ignoring case does, several times faster
+        self.keyword_re = re.compile(re.sub(r'\\.|[^\\]+', lambda m: m.group() if m.group()[0] == "\\"
+            else m.group().lower(), keyword_exp)) if keyword_exp else None
+        # original url_re = r'(https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|www\.[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9]+\.[^\s]{2,}|www\.[a-zA-Z0-9]+\.[^\s]{2,})'
+        # modified to remove urls bc now no punctuation
+        self.url_re = re.compile(r'(httpstco)[a-zA-Z0-9][a-zA-Z0-9-]+')
+        # usernames only have their @ until punctuation is stripped, so they're removed before
+        # that, if at all; by default they're kept as words like they always have been
+        self.mention_re = re.compile(r'@\w+') if drop_mentions else None
+        self.token_re = re.compile(r"[a-zA-Z]\w+\'?\w*")
+        self.to_root = state["lemmatizer"].lemmatize if stem_or_lem == "lem" else state["stemmer"].stem
+        self.word_tokens = {} # word -> its tokens, lemmatized or stemmed
+
+    # (preprocessed text, tokens) of a Tweet, tokens None if tokenize == False, or None for a
+    # Tweet without text or without any of the keywords
+    def normalize(self, text, tokenize = True):
+        if not isinstance(text, str):
+            return None
+        text = text.lower()
+        if self.mention_re is not None:
+            text = self.mention_re.sub('', text)
+        text = self.punct_re.sub('', text)
+        if self.keyword_re is not None and not self.keyword_re.search(text):
+            return None
+
+        words = [word for word in text.split() if not word in self.stop_words and not (
+            word.startswith("httpstco") and self.url_re.match(word))]
+        return ' '.join(words), (self.words_to_tokens(words) if tokenize else None)
+
+    # tokens of already preprocessed text
+    def tokenize(self, text):
+        return self.words_to_tokens(text.split())
+
+    def words_to_tokens(self, words):
+        tokens = []
+        for word in words:
+            word_tokens = self.word_tokens.get(word)
+            if word_tokens is None:
+                word_tokens = [self.to_root(token) for token in self.token_re.findall(word)]
+                if len(self.word_tokens) < self.max_cached_words:
+                    self.word_tokens[word] = word_tokens
+            tokens.extend(word_tokens)
+        return tokens
+
+
+# normalizers already built in this process, so that files processed with the same settings
+# (and a pool worker's files) share one and its remembered words
+normalizers = {}
+
+def get_normalizer(keyword_exp = None, custom_stop = None, stem_or_lem = "lem", drop_mentions = False):
+    key = (keyword_exp, tuple(custom_stop or ()), stem_or_lem, drop_mentions)
+    if key not in normalizers:
+        normalizers[key] = TweetNormalizer(keyword_exp, custom_stop, stem_or_lem, drop_mentions)
+    return normalizers[key]
+
+
+# keeps the Tweets in the date range that the normalizer keeps, adding their preprocessed text
+# and, if tokenize, tokens. the kept rows are taken from df once, rather than copying the
+# whole frame at each step
+def normalize_tweets(
     df,
+    normalizer,
     tweet_col = "Tweet Text",
-    date_col="Tweet Timestamp",
+    date_col = "Tweet Timestamp",
     start_dt = None,
     end_st = None,
-    keyword_exp = None,
-    custom_stop = None):
-
-    df_copy = df.copy()
+    tokenize = True):
 
     # format the date 
-    df_copy[date_col] = df_copy[date_col].apply(lambda row: datetime.strptime(
-        row, "%Y-%m-%d %H:%M:%S"))
+    dates = pd.to_datetime(df[date_col], format="%Y-%m-%d %H:%M:%S")
 
     # constrain to election cycle, here 1 year 
+    in_range = np.ones(len(df), dtype=bool)
     if start_dt:
-        df_copy = df_copy[df_copy[date_col] >= start_dt]
+        in_range &= (dates >= start_dt).to_numpy()
     if end_st:
-        df_copy = df_copy[df_copy[date_col] <= end_st]
+        in_range &= (dates <= end_st).to_numpy()
 
-    # lower the tweets
-    df_copy["preprocessed_" + tweet_col] = df_copy[tweet_col].str.lower()
+    texts = df[tweet_col].to_numpy()
+    rows, preprocessed, tokenized = [], [], []
+    for i in np.flatnonzero(in_range):
+        normalized = normalizer.normalize(texts[i], tokenize)
+        if normalized is not None:
+            rows.append(i)
+            preprocessed.append(normalized[0])
+            tokenized.append(normalized[1])
 
-    # remove punctuation
-    p = re.compile(r'[^\w\s]+')
-    df_copy["preprocessed_" + tweet_col] = [p.sub('', x) for x in df_copy["preprocessed_" + tweet_col].tolist()]
+    df_out = df.take(rows)
+    df_out[date_col] = dates.to_numpy()[rows]
+    df_out["preprocessed_" + tweet_col] = preprocessed
+    if tokenize:
+        df_out["tokenized_" + tweet_col] = tokenized
 
-    if keyword_exp:
-        mask = df_copy["preprocessed_" + tweet_col].str.contains(keyword_exp, na=False, case=False)
-        df_copy = df_copy.loc[mask]
+    return df_out
 
-    # filter out stopwords and urls 
-    try:
-        en_stop_words = stopwords.words("english")
-    except LookupError:
-        nltk_dl("stopwords")
-        en_stop_words = stopwords.words("english")
-
-    if custom_stop:
-        en_stop_words.extend(custom_stop)
-
-    # original url_re = r'(https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|www\.[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9]+\.[^\s]{2,}|www\.[a-zA-Z0-9]+\.[^\s]{2,})'
-    # modified to remove urls bc now no punctuation
-    url_re = r'(httpstco)[a-zA-Z0-9][a-zA-Z0-9-]+'
 
-    # remove usernames
-    at_re = r"@[a-z]*"
-    df_copy['preprocessed_' + tweet_col] = df_copy['preprocessed_' + tweet_col].apply(
-        lambda row: ' '.join([word for word in row.split() if (
-            not word in en_stop_words) and (not re.match(url_re, word)) and (not re.match(at_re, word))]))
+def subset_and_preprocess_tweets(
+    df,
+    tweet_col = "Tweet Text",
+    date_col="Tweet Timestamp",
+    start_dt = None,
+    end_st = None,
+    keyword_exp = None,
+    custom_stop = None):
 
-    return df_copy
+    return normalize_tweets(df, get_normalizer(keyword_exp, custom_stop), tweet_col, date_col,
+        start_dt, end_st, tokenize = False)
 
 
 #  tokenizing, stemming or lemmatizing
@@ -97,60 +200,203 @@ def token_and_stem_tweets(
     stem_or_lem = "lem"
     ):
 
-    df_copy = df.copy()
+    normalizer = get_normalizer(stem_or_lem = stem_or_lem)
 
-    # tokenize the tweets
-    tokenizer = RegexpTokenizer(r"[a-zA-Z]\w+\'?\w*")
-    stemmer = SnowballStemmer("english")
-    lemmatizer = WordNetLemmatizer()
+    texts = df["preprocessed_" + tweet_col].to_numpy()
+    rows = np.flatnonzero(df["preprocessed_" + tweet_col].notna().to_numpy())
 
-    df_copy.dropna(subset=["preprocessed_"+ tweet_col], inplace=True)
+    df_out = df.take(rows)
+    df_out["tokenized_" + tweet_col] = [normalizer.tokenize(text) for text in texts[rows]]
 
-    if stem_or_lem == "lem":
-        try:
-            df_copy["tokenized_" + tweet_col] = df_copy["preprocessed_" + tweet_col].apply(
-                lambda row: [lemmatizer.lemmatize(token) for token in tokenizer.tokenize(row)]
-                )
-        except LookupError:
-            nltk_dl("wordnet")
-            df_copy["tokenized_" + tweet_col] = df_copy["preprocessed_" + tweet_col].apply(
-                lambda row: [lemmatizer.lemmatize(token) for token in tokenizer.tokenize(row)]
-                )
-    elif stem_or_lem == "stem":
+    return df_out
 
-        try:
-            df_copy["tokenized_" + tweet_col] = df_copy["preprocessed_" + tweet_col].apply(
-                lambda row: [stemmer.stem(token) for token in tokenizer.tokenize(row)]
-                )
 
-        except LookupError:
-            nltk_dl("wordnet")
-            df_copy["tokenized_" + tweet_col] = df_copy["preprocessed_" + tweet_col].apply(
-                lambda row: [stemmer.stem(token) for token in tokenizer.tokenize(row)]
-                )
+# filepaths of every candidate's "all tweets" csv under the data root, minus the excluded groups
+def get_corpus_fps(ff):
+    allglob="**/*all tweet*"
+    minusglob1 = "*Rep*/**/*all tweet*" # "*Dem*/**/*all tweet*" # need to add /**/ for Dem bc of different file structure
+    minusglob2 = "*Biden*/*all tweet*"
+    minusglob3 = "*Legislative*/**/*all tweet*"
+    return glob_minus_glob(ff, allglob,
+        minusglob1, minusglob2, minusglob3)
+
+
+# progress monitor, prints about every 1% of files
+def print_file_progress(i, n_files):
+    one_percent_done = max(n_files // 100, 1)
+    if i % one_percent_done == 0:
+        print(f"Approx. {int(floor(i/n_files*100))}% complete, {i} files read")
+
+
+# reads one Tweet csv, optionally keeping a random sample_p share of its rows, and
+# subsets/preprocesses it; tokenizes too unless tokenize == False. the sample is drawn from
+# seed and the filepath, so the same seed always gives the same rows of a file
+def process_tweet_file(
+    csv,
+    keyword_exp = None,
+    start_dt = None,
+    end_st = None,
+    custom_stop = None,
+    sample_p = None,
+    seed = None,
+    tokenize = True,
+    stem_or_lem = "lem"):
+
+    if sample_p is not None:
+        rng = random.Random(None if seed is None else f"{seed}{csv}")
+        # if random from [0,1] interval is greater than p the row will be skipped
+        temp_df = pd.read_csv(csv, skiprows=lambda i: i>0 and rng.random() > sample_p)
+    else:
+        temp_df = pd.read_csv(csv)
+
+    # preprocessed and tokenized in the one pass
+    normalizer = get_normalizer(keyword_exp, custom_stop, stem_or_lem)
+    return normalize_tweets(temp_df, normalizer, start_dt=start_dt, end_st=end_st,
+        tokenize=tokenize)
+
 
-    return df_copy
+# runs in a pool worker: loads the nltk state before the first file rather than during it
+def _init_tweet_worker():
+    get_nltk_state()
+
+
+# process_tweet_file() for one file of a batch; an error comes back as a message rather than
+# raising, so one bad file doesn't stop the rest
+def _process_tweet_file_job(csv, kwargs):
+    try:
+        return process_tweet_file(csv, **kwargs), None
+    except Exception as e:
+        message = str(e).split("\n")[0] # pandas's errors can run on over several lines
+        return None, f"{type(e).__name__}: {message}"
+
+
+def iter_processed_tweet_files(fps, keyword_exp = None, start_dt = None, end_st = None,
+    custom_stop = None, sample_p = None, seed = None, tokenize = True, stem_or_lem = "lem",
+    n_workers = 1, failures = None, print_progress = False):
+    """Reads, preprocesses and tokenizes Tweet csv files, one at a time or spread over a pool of processes, yielding them in order so only a few files' Tweets are in memory at once.
+
+    Args:
+        fps (list): Filepaths of the Tweet csv files, e.g. from get_corpus_fps().
+        keyword_exp (str, optional): Regular expression a preprocessed Tweet must contain to be kept. Defaults to None.
+        start_dt (datetime, optional): Beginning of Tweet date range to include. Defaults to None.
+        end_st (datetime, optional): End of Tweet date range to include. Defaults to None.
+        custom_stop (list, optional): Stopwords to remove on top of nltk's English ones. Defaults to None.
+        sample_p (float, optional): Share of each file's Tweets to randomly keep, all of them if None. Defaults to None.
+        seed (optional): Seed for the sample, so that repeated reads keep the same Tweets. Defaults to None.
+        tokenize (bool, optional): Tokenize as well as preprocess. Defaults to True.
+        stem_or_lem (str, optional): Stem ("stem") or lemmatize ("lem") the tokens. Defaults to "lem".
+        n_workers (int, optional): Processes to spread the files over, each with its own nltk state. Defaults to 1, processing in this process.
+        failures (list, optional): Appended a (filepath, error) tuple for each file that couldn't be processed. Defaults to None.
+        print_progress (bool, optional): Print roughly every 1% of files read. Defaults to False.
+
+    Yields:
+        pd.DataFrame: The processed Tweets of each file, in the order of fps whatever n_workers is. Files that can't be processed are reported and skipped.
+    """
+
+    fps = list(fps)
+    kwargs = dict(keyword_exp = keyword_exp, start_dt = start_dt, end_st = end_st,
+        custom_stop = custom_stop, sample_p = sample_p, seed = seed, tokenize = tokenize,
+        stem_or_lem = stem_or_lem)
+
+    def results():
+        if n_workers == 1:
+            for csv in fps:
+                yield _process_tweet_file_job(csv, kwargs)
+            return
+        get_nltk_state() # any nltk downloads happen here, once, not in every worker at once
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_tweet_worker) as pool:
+            # a few files queued per worker, collected in order, so finished files don't
+            # pile up in memory while an earlier slow one is still being processed
+            pending = deque()
+            for csv in fps:
+                pending.append(pool.submit(_process_tweet_file_job, csv, kwargs))
+                if len(pending) >= 2*n_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    for i, (csv, (temp_df, error)) in enumerate(zip(fps, results()), start=1):
+        if print_progress:
+            print_file_progress(i, len(fps))
+        if error is not None:
+            print(f"Skipped {csv}: {error}")
+            if failures is not None:
+                failures.append((csv, error))
+            continue
+        yield temp_df
+
+
+class TweetCorpusStream:
+    """Restartable iterable over the tokenized Tweets of many csv files, yielding one list of tokens per Tweet.
+
+    Each pass re-reads the files one at a time through iter_processed_tweet_files(), so memory stays \
+bounded however many files there are, and it can be handed to corpora.Dictionary, or through \
+BowCorpusStream to models.LdaModel, which both iterate over it more than once.
+    """
+
+    def __init__(self, fps, keyword_exp = None, start_dt = None, end_st = None,
+        custom_stop = None, sample_p = None, seed = None, stem_or_lem = "lem",
+        tweet_col = "Tweet Text", n_workers = 1, print_progress = False):
+
+        self.fps = list(fps)
+        self.keyword_exp = keyword_exp
+        self.start_dt = start_dt
+        self.end_st = end_st
+        self.custom_stop = custom_stop
+        self.sample_p = sample_p
+        # every pass has to sample the same Tweets, or the dictionary and the model won't agree
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.stem_or_lem = stem_or_lem
+        self.tweet_col = tweet_col
+        self.n_workers = n_workers
+        self.print_progress = print_progress
+        self.failures = [] # (filepath, error) of the files the last pass couldn't process
+
+    def iter_frames(self):
+        self.failures = []
+        return iter_processed_tweet_files(self.fps, self.keyword_exp, self.start_dt, self.end_st,
+            self.custom_stop, sample_p = self.sample_p, seed = self.seed,
+            stem_or_lem = self.stem_or_lem, n_workers = self.n_workers,
+            failures = self.failures, print_progress = self.print_progress)
+
+    def __iter__(self):
+        for temp_df in self.iter_frames():
+            yield from temp_df["tokenized_" + self.tweet_col]
+
+
+# bag-of-words vectors of a token stream, recomputed on every pass
+class BowCorpusStream:
+
+    def __init__(self, token_stream, dictionary_LDA):
+        self.token_stream = token_stream
+        self.dictionary_LDA = dictionary_LDA
+
+    def __iter__(self):
+        for list_of_tokens in self.token_stream:
+            yield self.dictionary_LDA.doc2bow(list_of_tokens)
 
 
 def gen_df_climate_tweets(data_full_filepath: str, cli_kw_ff: str,
     setting: str = "load_csv", start_dt:datetime=datetime(2019,11,3,0,0,0), 
-    end_st:datetime=datetime(2020,11,3,0,0,0), stopwords_changed:bool = False, custom_stop:list = None):
+    end_st:datetime=datetime(2020,11,3,0,0,0), stopwords_changed:bool = False, custom_stop:list = None,
+    n_workers:int = 1):
     """Loads/generates a pd.DataFrame and preprocesses it to be ready for LDA.
 
     Args:
         data_full_filepath (str): 
         cli_kw_ff (str): Filepath to the JSON file with keywords to mark a Tweet as relevant.
-        setting (str, optional): Approach to use to retrieve data. Options: "load_20_random_appended", "load_5_perc_sample", "process_5_percent_sample", "process_corpus_new", "load_dir", "load_csv". GitHub code is ready out-of-the-box for load_20_random_appended and load_5_perc_sample. Other options require user to provide own data. Defaults to "load_csv".
+        setting (str, optional): Approach to use to retrieve data. Options: "load_20_random_appended", "load_5_perc_sample", "process_5_percent_sample", "process_corpus_new", "stream_corpus", "load_dir", "load_csv". "stream_corpus" reads the files under data_full_filepath one at a time as they are used, for corpora too large for memory. GitHub code is ready out-of-the-box for load_20_random_appended and load_5_perc_sample. Other options require user to provide own data. Defaults to "load_csv".
         start_dt (datetime, optional): Beginning of Tweet date range to include. Defaults to datetime(2019,11,3,0,0,0).
         end_st (datetime, optional): End of Tweet date range to include. Defaults to datetime(2020,11,3,0,0,0).
         stopwords_changed (bool, optional): Indicate whether the stopwords have changed since exporting a processed dataset, if loading a csv dataset. Defaults to False.
         custom_stop (list, optional): List of stopwords to consider when re-processing if stopwords_changed == True. Defaults to None.
+        n_workers (int, optional): Processes to spread the files over for "process_corpus_new" and "stream_corpus". Files are still combined in the same order, and any that fail are listed. Defaults to 1.
 
     Raises:
         ValueError: Setting is enforced. 
 
     Returns:
-        pd.DataFrame: pd.DataFrame ready for LDA analysis. 
+        pd.DataFrame: pd.DataFrame ready for LDA analysis, or a TweetCorpusStream for "stream_corpus". 
     """
 
     if re.compile("http").search(cli_kw_ff): # for URLs
@@ -162,19 +408,15 @@ def gen_df_climate_tweets(data_full_filepath: str, cli_kw_ff: str,
     keyword_exp = ("|".join(keyword_list))
 
     ff = data_full_filepath
+    tokenized = False
 
     if setting == "load_dir":
     # (1) load tweets prepopulated into a folder 
         os.chdir(ff)
         csvs = glob("*.csv")
 
-        # compile df of all tweets
-        for csv in csvs:
-            temp_df = pd.read_csv(csv)
-            try:
-                df = df.append(temp_df)
-            except NameError:
-                df = temp_df
+        # compile df of all tweets, concatenated once rather than appended file by file
+        df = pd.concat([pd.read_csv(csv) for csv in csvs])
 
         print("pre subset/process df length:", df.shape[0])
         df = subset_and_preprocess_tweets(
@@ -189,35 +431,23 @@ def gen_df_climate_tweets(data_full_filepath: str, cli_kw_ff: str,
     elif setting == "load_csv":
         df = pd.read_csv(ff)
 
+    # (3) stream the whole corpus one file at a time, for corpora too big for memory
+    elif setting == "stream_corpus":
+        return TweetCorpusStream(get_corpus_fps(ff), keyword_exp, start_dt, end_st,
+            custom_stop, n_workers = n_workers, print_progress = True)
+
     elif setting == "process_5_percent_sample" or setting == "process_corpus_new":
-        allglob="**/*all tweet*"
-        minusglob1 = "*Rep*/**/*all tweet*" # "*Dem*/**/*all tweet*" # need to add /**/ for Dem bc of different file structure 
-        minusglob2 = "*Biden*/*all tweet*"
-        minusglob3 = "*Legislative*/**/*all tweet*"
-        fps = glob_minus_glob(ff, allglob, 
-            minusglob1, minusglob2, minusglob3)
-
-        i = 0
-        one_percent_done = len(fps)/100
-        one_percent_done_digits = int(log10(one_percent_done)) + 1
-        rounded_total = round_to_n(len(fps), one_percent_done_digits + 1)
-        one_percent_done = int(floor(one_percent_done))
+        fps = get_corpus_fps(ff)
+        frames = []
     
         # generate 5% of Tweets from all (Dem) candidates 
         if setting == "process_5_percent_sample":
             p = 0.05  # proportion of the lines to use
             # if random from [0,1] interval is greater than p the row will be skipped
-            for csv in fps:
-                temp_df = pd.read_csv(csv, skiprows=lambda i: i>0 and random.random() > p) 
-                try:
-                    df = df.append(temp_df)
-                except NameError:
-                    df = temp_df
-                # progress monitor
-                i += 1
-
-                if i % one_percent_done  == 0:
-                    print(f"Approx. {int(floor(i/rounded_total*100))}% complete, {i} files read")
+            for i, csv in enumerate(fps, start=1):
+                frames.append(pd.read_csv(csv, skiprows=lambda i: i>0 and random.random() > p))
+                print_file_progress(i, len(fps))
+            df = pd.concat(frames)
 
             print("pre subset/process df length:", df.shape[0])
             df = subset_and_preprocess_tweets(
@@ -230,28 +460,17 @@ def gen_df_climate_tweets(data_full_filepath: str, cli_kw_ff: str,
 
         elif setting == "process_corpus_new":
             # process as we go option here to avoid overwhelming computer memory
-            for csv in fps:
-                temp_df = pd.read_csv(csv)  
-                try:
-                    temp_df = subset_and_preprocess_tweets(
-                        temp_df, 
-                        start_dt=start_dt,
-                        end_st=end_st, 
-                        keyword_exp=keyword_exp,
-                        custom_stop=custom_stop)
-                except AttributeError:
-                    continue
-                try:
-                    df = df.append(temp_df)
-                except NameError:
-                    df = temp_df
-                # progress monitor
-                i += 1
-
-                if i % one_percent_done  == 0:
-                    print(f"Approx. {int(floor(i/rounded_total*100))}% complete, {i} files read")
-
-            print(f"100% complete, {i} files read.")
+            failures = []
+            frames = list(iter_processed_tweet_files(fps, keyword_exp, start_dt, end_st,
+                custom_stop, n_workers = n_workers, failures = failures, print_progress = True))
+            df = pd.concat(frames)
+            tokenized = True
+
+            print(f"100% complete, {len(frames)} files read.")
+            if failures:
+                print(f"{len(failures)} files could not be processed:")
+                for csv, error in failures:
+                    print(f"    {csv}: {error}")
 
     else:
         raise ValueError(f"{setting} is not an allowable setting. see code for options.")
@@ -264,8 +483,10 @@ def gen_df_climate_tweets(data_full_filepath: str, cli_kw_ff: str,
             keyword_exp=keyword_exp,
             custom_stop=custom_stop)
         print("Re-processed stopwords from data file")
+        tokenized = False
 
-    df = token_and_stem_tweets(df)
+    if not tokenized:
+        df = token_and_stem_tweets(df)
 
     return df 
 
@@ -347,7 +568,54 @@ def run_lda(df:pd.DataFrame, tokenized_text_col:str = "tokenized_Tweet Text",
                 print()
 
     return lda_model, corpus, dictionary_LDA
-    
+
+
+def run_lda_stream(tweet_stream:TweetCorpusStream, num_topics:int=20,
+    extreme_low:float = 0.0025, extreme_high:float = 0.25, passes:int=4,
+    mm_path:str = None, bigrams:bool=False, trigrams:bool=False,
+    lda_example_print:str = None, viz:bool = True):
+    """run_lda() for a corpus streamed from disk rather than held in a pd.DataFrame.
+
+    Args:
+        tweet_stream (TweetCorpusStream): Tokenized Tweets, e.g. from gen_df_climate_tweets(setting="stream_corpus").
+        num_topics (int, optional): Number of topics in LDA. Defaults to 20.
+        extreme_low (float, optional): no_below for filtering the dictionary's extremes. Defaults to 0.0025.
+        extreme_high (float, optional): no_above for filtering the dictionary's extremes. Defaults to 0.25.
+        passes (int, optional): Number of passes through the corpus. Defaults to 4.
+        mm_path (str, optional): File to serialize the bag-of-words corpus to, so that the passes read vectors from disk instead of re-processing every csv each time. Defaults to None.
+        bigrams, trigrams (bool, optional): Not available for streamed corpora. Defaults to False.
+        lda_example_print (str, optional): "topics" prints the topics; "sample" isn't available for streamed corpora. Defaults to None.
+        viz (bool, optional): Unused here, read by gen_lda_wrapper(). Defaults to True.
+
+    Returns:
+        lda_model, corpus, dictionary_LDA as in run_lda(), with corpus an iterable rather than a list.
+    """
+
+    if bigrams or trigrams:
+        raise ValueError("bigrams and trigrams are not available for streamed corpora, use run_lda.")
+    if lda_example_print not in (None, "topics"):
+        raise ValueError(f"{lda_example_print} is not available for streamed corpora, use run_lda.")
+
+    # one pass for the dictionary, then the vectors are made as the model asks for them
+    dictionary_LDA = corpora.Dictionary(tweet_stream)
+    dictionary_LDA.filter_extremes(no_below=extreme_low, no_above=extreme_high)
+    corpus = BowCorpusStream(tweet_stream, dictionary_LDA)
+    if mm_path is not None:
+        corpora.MmCorpus.serialize(mm_path, corpus)
+        corpus = corpora.MmCorpus(mm_path)
+
+    lda_model = models.LdaModel(corpus, num_topics=num_topics, \
+                    id2word=dictionary_LDA, \
+                    passes=passes, alpha="auto", \
+                    eta="auto")
+
+    if lda_example_print == "topics":
+        for i,topic in lda_model.show_topics(formatted=True, num_topics=num_topics, num_words=15):
+            print(str(i)+": "+ topic)
+            print()
+
+    return lda_model, corpus, dictionary_LDA
+
 
 def graph_coherence(df, tokenized_text_col, range_min = 1, range_max=35, 
     passes = 10, print_=True):
@@ -399,7 +667,7 @@ Options for both running the LDA analysis and graphing coherence to determine th
 optimal number of topics for the model to development, given the data.
 
     Args:
-        df (pd.DataFrame): Data pre-processed by gen_df_climate_tweets().
+        df (pd.DataFrame): Data pre-processed by gen_df_climate_tweets(). A TweetCorpusStream runs LDA through run_lda_stream().
         tokenized_text_col (str, optional): Column containing the tokenized (and stemmed or lemmatized) Tweet Text. Defaults to "tokenized_Tweet Text".
         lda_setting (str, optional): Run LDA ("run_lda") or graph coherence ("graph_coherence"). Defaults to "run_lda".
         lda_logging (str, optional): Run LDA logs in terminal ("terminal") or save to designated file ("file"). Defaults to "terminal".
@@ -440,6 +708,8 @@ optimal number of topics for the model to development, given the data.
         raise ValueError(f"{lda_logging} is not a valid selection for lda_logging. see code for options.")
 
     if lda_setting == "graph_coherence":
+        if isinstance(df, TweetCorpusStream):
+            raise ValueError("graph_coherence needs a pd.DataFrame, not a streamed corpus.")
 
         tweets_coherence = graph_coherence(
             df=df, 
@@ -454,7 +724,8 @@ optimal number of topics for the model to development, given the data.
     elif lda_setting == "run_lda":
         # run the LDA with a selected number of topics 
 
-        lda_model, corpus, dictionary_LDA = run_lda(
+        run = run_lda_stream if isinstance(df, TweetCorpusStream) else run_lda
+        lda_model, corpus, dictionary_LDA = run(
             df, 
             num_topics=num_topics,
             passes=passes,